@@ -0,0 +1,98 @@
+"""
+Peak memory of loading and running a large migrations history.
+
+python -m benchmarks.bench_memory [count]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationStateData
+
+MIGRATION_TEMPLATE = '''"""Benchmark migration {index}"""
+
+dependencies = [{dependencies}]
+
+CONSTANT = [{index}] * 1000
+
+
+def upgrade(db) -> bool:
+    return True
+
+
+def downgrade(db) -> bool:
+    return True
+'''
+
+
+def create_package(folder: str, package: str, count: int):
+    package_folder = os.path.join(folder, package)
+    os.makedirs(package_folder)
+    previous = ''
+    for index in range(count):
+        name = '{0:08d}_migration'.format(index)
+        with open(os.path.join(package_folder, name+'.py'), 'w') as f:
+            f.write(MIGRATION_TEMPLATE.format(index=index,
+                                              dependencies=previous))
+        previous = repr(name)
+
+
+def measure(title: str, function):
+    tracemalloc.start()
+    t0 = time.time()
+    result = function()
+    elapsed = int((time.time()-t0)*1000)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{0:30} {1:8} ms  current {2:10,} B  peak {3:10,} B'.format(
+        title, elapsed, current, peak))
+    return result
+
+
+def run_migrations(setup: MigrationSetup):
+    for migration in setup.migrations:
+        migration.upgrade(None)
+        migration.after_upgrade(None)
+        migration.release()
+
+
+def create_states(count: int):
+    now = datetime.datetime.now()
+    return [MigrationStateData({'_id': '{0:08d}_migration'.format(index),
+                                'applied': now,
+                                'description': 'Benchmark migration',
+                                'running_time': index})
+            for index in range(count)]
+
+
+def main(count: int = 10000):
+    package = 'bench_migrations'
+    with tempfile.TemporaryDirectory() as folder:
+        create_package(folder, package, count)
+        cwd = os.getcwd()
+        os.chdir(folder)
+        sys.path.insert(0, folder)
+        try:
+            setup = measure('load {0} migrations'.format(count),
+                            lambda: MigrationSetup('mongodb://localhost:27017/bench',
+                                                   package))
+            measure('run and release', lambda: run_migrations(setup))
+            for migration in setup.migrations:
+                migration.release()
+            setup = None
+            setup = measure('load {0} released'.format(count),
+                            lambda: MigrationSetup('mongodb://localhost:27017/bench',
+                                                   package, release_modules=True))
+            measure('run and release', lambda: run_migrations(setup))
+            measure('{0} states'.format(count), lambda: create_states(count))
+        finally:
+            sys.path.remove(folder)
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,31 @@
+"""
+Overhead of tracing spans, with and without the in-process recorder.
+
+python -m benchmarks.bench_tracing [count]
+"""
+import sys
+import time
+
+from src.utils.tracing import SpanRecorder, trace
+
+
+def run_spans(count: int):
+    t0 = time.perf_counter()
+    with trace('canaa.upgrade'):
+        for index in range(count):
+            with trace('canaa.migration', name=index):
+                pass
+    return time.perf_counter() - t0
+
+
+def main(count: int = 100000):
+    elapsed = run_spans(count)
+    print('{0:30} {1:8.3f} us/span'.format('no recorder', elapsed / count * 1e6))
+    with SpanRecorder() as recorder:
+        elapsed = run_spans(count)
+    print('{0:30} {1:8.3f} us/span ({2} spans)'.format(
+        'in-process recorder', elapsed / count * 1e6, len(recorder.spans)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,11 +1,19 @@
 import argparse
 import os
+import sys
 
 from src.canaa_migrations import CanaaMigrations
+from src.cli.cli_audit import cli_audit
+from src.cli.cli_bundle import cli_bundle
 from src.cli.cli_downgrade import cli_downgrade
+from src.cli.cli_estimate import cli_estimate
 from src.cli.cli_generate import cli_generate
+from src.cli.cli_history import cli_history, cli_regressions
 from src.cli.cli_list import cli_list
+from src.cli.cli_replay import cli_record, cli_replay
+from src.cli.cli_status import cli_status
 from src.cli.cli_upgrade import cli_upgrade
+from src.cli.cli_verify import cli_verify
 from src.migration_setup import MigrationSetup
 from src.utils.command_logger import CommandLogger
 
@@ -14,10 +22,17 @@ def main():
     parser = setup_parser()
 
     args = parser.parse_args()
+    validate_args(parser, args)
     if hasattr(args, 'func'):
-        args.func(args)
-    else:
-        parser.print_help()
+        return args.func(args)
+    parser.print_help()
+
+
+def validate_args(parser, args):
+    if getattr(args, 'async_engine', False) and \
+            (args.time_budget is not None or args.background or args.grouped):
+        parser.error('--async can not be combined with '
+                     '--time-budget, --background or --grouped')
 
 
 def setup_parser():
@@ -33,6 +48,19 @@ def setup_parser():
     parser.add_argument('-c', '--migrations-collection',
                         default='canaa_migrations',
                         help='Collection to store migrations')
+    parser.add_argument('-b', '--bundle',
+                        default=os.getenv('MIGRATIONS_BUNDLE', None),
+                        help='Load migrations from precompiled bundle file')
+    parser.add_argument('--load-workers', type=int,
+                        default=int(os.getenv('MIGRATIONS_LOAD_WORKERS', 1)),
+                        help='Processes compiling migrations files of packages with '
+                        '{0}+ modules (default: 1, sequential imports)'.format(
+                            MigrationSetup.PARALLEL_LOAD_MIN_MODULES))
+    parser.add_argument('--history-collection',
+                        default=os.getenv('MIGRATIONS_HISTORY_COLLECTION', None),
+                        metavar='[DATABASE.]COLLECTION',
+                        help='Run history collection, shared by databases of many tenants '
+                        '(default: <migrations collection>_history)')
 
     subparsers = parser.add_subparsers()
 
@@ -41,6 +69,14 @@ def setup_parser():
 
     list_migrations.add_argument('--show-state', action='store_true',
                                  default=False, help="Show state of migration on database")
+    list_migrations.add_argument('--format', choices=['table', 'json', 'csv'],
+                                 default='table',
+                                 help="Output format (json: one object per line)")
+    list_filter = list_migrations.add_mutually_exclusive_group()
+    list_filter.add_argument('--pending-only', action='store_true',
+                             default=False, help="Show only pending migrations")
+    list_filter.add_argument('--applied-only', action='store_true',
+                             default=False, help="Show only applied migrations")
     list_migrations.set_defaults(func=cli_list)
 
     generate = subparsers.add_parser('generate',
@@ -52,18 +88,131 @@ def setup_parser():
     upgrade.add_argument('--until',
                          help="Run upgrade until named migration",
                          action='store')
+    upgrade.add_argument('--time-budget', type=float, metavar='SECONDS',
+                         help="Run only migrations that fit in the time budget, "
+                         "deferring the deferrable ones")
+    upgrade.add_argument('--background', action='store_true', default=False,
+                         help="Also run online migrations, throttled")
+    upgrade.add_argument('--max-ops', type=int, default=1000,
+                         help="Online migrations: max write operations per second")
+    upgrade.add_argument('--target-p99-ms', type=int, default=50,
+                         help="Online migrations: back off when command p99 latency is above")
+    upgrade.add_argument('--grouped', action='store_true', default=False,
+                         help="Run consecutive small migrations (declared small, or with "
+                         "a known estimate) in transactions (replica sets), one commit per group")
+    upgrade.add_argument('--group-max-ops', type=int, default=1000,
+                         help="Grouped mode: max commands per transaction")
+    upgrade.add_argument('--group-max-ms', type=int, default=5000,
+                         help="Grouped mode: max time per transaction")
+    upgrade.add_argument('--async', dest='async_engine', action='store_true',
+                         default=False,
+                         help="Run independent migrations concurrently on an event loop")
+    upgrade.add_argument('--concurrency', type=int, default=4,
+                         help="Async engine: migrations running at once")
+    upgrade.add_argument('--report', metavar='PATH',
+                         help="Write run report: JSON, or Prometheus textfile for .prom")
     upgrade.set_defaults(func=cli_upgrade)
 
     downgrade = subparsers.add_parser('downgrade', help='Downgrades database')
     downgrade.add_argument('--keep',
                            help="Run downgrade until named migration",
                            action='store')
+    downgrade.add_argument('--report', metavar='PATH',
+                           help="Write run report: JSON, or Prometheus textfile for .prom")
     downgrade.set_defaults(func=cli_downgrade)
 
+    verify = subparsers.add_parser(
+        'verify', help='Reports drifted, missing and orphaned migrations. '
+        'Exit code: 0 verified, 1 error, 10 drifted, 11 orphaned')
+    verify.set_defaults(func=cli_verify)
+
+    estimate = subparsers.add_parser(
+        'estimate',
+        help='Estimates running time of a migration on a sampled scratch database')
+    estimate.add_argument('name', help="Migration name")
+    estimate.add_argument('--sample-size', type=int, default=1000,
+                          help="Documents sampled per collection")
+    estimate.add_argument('--no-store', action='store_true', default=False,
+                          help="Don't store estimate in migration state")
+    estimate.add_argument('--scratch-uri', default=os.getenv('MIGRATIONS_SCRATCH_URI', None),
+                          help="MongoDB URI of scratch server, e.g. mongodb://localhost "
+                          "(default: migrations server)")
+    estimate.set_defaults(func=cli_estimate)
+
+    audit = subparsers.add_parser(
+        'audit',
+        help='Explains commands of pending migrations on a sampled scratch database, '
+        'reporting collection scans and in-memory sorts. '
+        'Exit code: 0 none, 1 error, 10 findings')
+    audit.add_argument('names', nargs='*', help="Migration names (default: all pending)")
+    audit.add_argument('--sample-size', type=int, default=1000,
+                       help="Documents sampled per collection")
+    audit.add_argument('--scratch-uri', default=os.getenv('MIGRATIONS_SCRATCH_URI', None),
+                       help="MongoDB URI of scratch server, e.g. mongodb://localhost "
+                       "(default: migrations server)")
+    audit.set_defaults(func=cli_audit)
+
+    record = subparsers.add_parser(
+        'record',
+        help='Applies a deterministic migration, recording its commands')
+    record.add_argument('name', help="Migration name")
+    record.add_argument('-o', '--output',
+                        help="Command log file (default: <name>.replay)")
+    record.set_defaults(func=cli_record)
+
+    replay = subparsers.add_parser(
+        'replay', help='Applies recorded migrations without running their code')
+    replay.add_argument('files', nargs='+', help="Command log files")
+    replay.add_argument('-t', '--target', action='append',
+                        help="Target MongoDB URI (repeatable, default: --uri-mongodb)")
+    replay.set_defaults(func=cli_replay)
+
+    status = subparsers.add_parser(
+        'status',
+        help='Shows pending, applied and orphaned migrations. '
+        'Exit code: 0 up to date, 1 error, 10 pending, 11 orphaned')
+    status.add_argument('-q', '--quiet', action='store_true', default=False,
+                        help="Show only counts")
+    status.set_defaults(func=cli_status)
+
+    history = subparsers.add_parser(
+        'history', help='Shows run history of migrations, newest first')
+    history.add_argument('name', nargs='?', help="Migration name (default: all)")
+    history.add_argument('-n', '--limit', type=int, default=50,
+                         help="Number of runs (0 for all)")
+    history.add_argument('-d', '--database',
+                         help="Runs of this database (default: all)")
+    history.set_defaults(func=cli_history)
+
+    regressions = subparsers.add_parser(
+        'regressions',
+        help='Flags recent upgrade runs slower than the median of previous runs. '
+        'Exit code: 0 none, 1 error, 10 regressions found')
+    regressions.add_argument('name', nargs='?', help="Migration name (default: all)")
+    regressions.add_argument('--recent', type=int, default=1,
+                             help="Recent runs checked per migration")
+    regressions.add_argument('--baseline', type=int, default=10,
+                             help="Previous runs in the rolling median baseline")
+    regressions.add_argument('--threshold', type=float, default=2.0,
+                             help="Flag runs slower than threshold * baseline")
+    regressions.add_argument('--min-time', type=int, default=100, metavar='MS',
+                             help="Ignore runs faster than this")
+    regressions.add_argument('--by-database', action='store_true', default=False,
+                             help="Baseline of each database apart "
+                             "(default: runs of all databases sharing the history)")
+    regressions.set_defaults(func=cli_regressions)
+
+    bundle = subparsers.add_parser(
+        'bundle', help='Packs migrations into a precompiled bundle file')
+    bundle.add_argument('-o', '--output',
+                        help="Bundle file (default: <migrations package>.bundle)",
+                        action='store')
+    bundle.set_defaults(func=cli_bundle)
+
     return parser
 
 
 if __name__ == "__main__":
     os.environ.update({'LOG_DEBUGGING': 'True'})
     CommandLogger.ENABLED = False
-    main()
+    sys.exit(main())
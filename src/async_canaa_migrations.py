@@ -0,0 +1,209 @@
+import asyncio
+import concurrent.futures
+import functools
+import time
+
+from src.canaa_migrations import CanaaMigrations
+from src.migration_action import MigrationAction
+from src.migration_history import MigrationHistory
+from src.migration_report import RunReport
+from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationState, MigrationStateData
+from src.utils.async_database import async_client, close_client
+from src.utils.logger import get_logger
+
+
+class AsyncCanaaMigrations:
+    """
+    Asyncio upgrade engine for I/O bound migrations.
+    Pending migrations run as tasks on one event loop, each one after the
+    migrations named in its dependencies, up to concurrency at once
+    (independent migrations may overlap, regardless of file order).
+    async def upgrade(db) receives an async database; sync upgrades,
+    state reads and writes run in a thread pool
+    """
+
+    LOG = get_logger()
+
+    def __init__(self, setup: MigrationSetup, concurrency: int = 4,
+                 workers: int = None):
+        self._setup = setup
+        self._engine = CanaaMigrations(setup)
+        self._states = MigrationState(setup)
+        self._history = MigrationHistory(setup)
+        self._concurrency = max(1, concurrency)
+        self._workers = workers or self._concurrency
+        self._executor = None
+        self._stopped = False
+        self.report: RunReport = None
+
+    def run(self, until_name: str = None) -> bool:
+        """ Runs upgrade on a new event loop """
+        return asyncio.run(self.upgrade(until_name))
+
+    async def upgrade(self, until_name: str = None) -> bool:
+        """
+        Executes upgrade until migration named until_name (inclusive).
+        Online migrations (and their dependents) are deferred to the
+        background mode of the sync engine.
+        Returns False if any migration was unsuccessful
+        """
+        self.report = RunReport('upgrade', self._setup.db.name,
+                                self._setup.collection.name)
+        with self.report:
+            return await self._upgrade(until_name)
+
+    async def _upgrade(self, until_name: str) -> bool:
+        self.LOG.info('Starting async upgrade')
+        t0 = time.time()
+        self._stopped = False
+        self._executor = concurrent.futures.ThreadPoolExecutor(self._workers)
+        client = None
+        try:
+            states = {state.name: state
+                      for state in await self._in_executor(
+                          self._states.read_states,
+                          [migration.name for migration in self._setup.migrations])}
+            just_applied, deferred, pending = self._pending_migrations(
+                states, until_name)
+
+            if any(migration.async_upgrade for migration, _ in pending):
+                client = async_client(self._setup.mongodb_uri)
+            db = client.get_default_database() if client is not None else None
+
+            semaphore = asyncio.Semaphore(self._concurrency)
+            tasks = {}
+            for migration, state in pending:
+                dependencies = [tasks[dependency] for dependency in migration.dependencies
+                                if dependency in tasks]
+                tasks[migration.name] = asyncio.ensure_future(self._run_migration(
+                    migration, state, dependencies, db, semaphore))
+            results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+
+            await self._in_executor(self._history.flush)
+            await self._in_executor(self._setup.save_checksums)
+        finally:
+            if client is not None:
+                await close_client(client)
+            self._executor.shutdown()
+            self._executor = None
+
+        successful = [name for name, result in results.items() if result]
+        unsuccessful = [name for name, result in results.items() if result is False]
+        not_run = [name for name, result in results.items() if result is None]
+        self.report.add_names(just_applied, 'previously_applied')
+        self.report.add_names(deferred, 'deferred')
+        self.report.add_names(not_run, 'not_run')
+        if just_applied:
+            self.LOG.info('PREVIOUSLY APPLIED: %s', just_applied)
+        if unsuccessful:
+            self.LOG.info('UNSUCCESSFUL MIGRATIONS: %s', unsuccessful)
+        if successful:
+            self.LOG.info('SUCCESSFUL MIGRATIONS: %s', successful)
+        if deferred:
+            self.LOG.info('DEFERRED MIGRATIONS: %s', deferred)
+        if not_run:
+            self.LOG.info('NOT RUN: %s', not_run)
+        self.LOG.info('Ending async upgrade: %s ms', int((time.time()-t0)*1000))
+        return not unsuccessful
+
+    def _pending_migrations(self, states: dict, until_name: str) -> tuple:
+        """ Returns (just applied names, deferred {name: reason}, [(migration, state)]) """
+        just_applied = []
+        deferred = {}
+        pending = []
+        for migration in self._setup.migrations:
+            state = states.get(migration.name) or \
+                MigrationStateData({"_id": migration.name})
+            deferred_dependencies = [dependency for dependency in migration.dependencies
+                                     if dependency in deferred]
+            if state.applied:
+                just_applied.append(migration.name)
+                migration.release()
+            elif deferred_dependencies:
+                deferred[migration.name] = \
+                    'depends on deferred {0}'.format(deferred_dependencies)
+                migration.release()
+            elif migration.online:
+                deferred[migration.name] = 'online migration, runs in background mode'
+                migration.release()
+            else:
+                pending.append((migration, state))
+            if migration.name == until_name:
+                self.LOG.info('Stopped migrations until %s', until_name)
+                break
+        return just_applied, deferred, pending
+
+    async def _run_migration(self, migration: MigrationAction,
+                             state: MigrationStateData, dependencies: list,
+                             db, semaphore: asyncio.Semaphore) -> bool:
+        """ Returns migration success, None if not run """
+        for dependency in dependencies:
+            if not await dependency:
+                self.LOG.warning('MIGRATION %s NOT RUN: DEPENDENCY NOT APPLIED',
+                                 migration.name)
+                migration.release()
+                return None
+
+        async with semaphore:
+            if self._stopped:
+                migration.release()
+                return None
+            t1 = time.time()
+            if migration.async_upgrade:
+                migration_success, can_continue = await self.apply_async_upgrade(
+                    migration, db)
+            else:
+                migration_success, can_continue = await self._in_executor(
+                    self._engine.apply_upgrade, migration)
+            running_time = int((time.time()-t1) * 1000)
+            if not can_continue:
+                self.LOG.warning(
+                    'Stopped next migrations by after_upgrade method result')
+                self._stopped = True
+
+            # Commands of concurrent migrations can't be told apart: not counted
+            self._history.add(migration.name, 'upgrade', running_time,
+                              None, bool(migration_success))
+            self.report.add(migration.name,
+                            'successful' if migration_success else 'unsuccessful',
+                            running_time)
+            if migration_success and migration.verifiable:
+                state.verification = await self._in_executor(
+                    self._engine.verify_upgrade, migration)
+            migration.release()
+            if migration_success:
+                await self._in_executor(self._engine.write_applied,
+                                        migration, state, running_time)
+        return bool(migration_success)
+
+    async def apply_async_upgrade(self, migration: MigrationAction, db) -> tuple:
+        """ Returns (migration_success, can_continue) """
+        if not await self._in_executor(self._engine.can_upgrade, migration):
+            self.LOG.warning('MIGRATION INTERRUPTED')
+            return False, False
+        self.LOG.info('Applying async upgrade %s: %s',
+                      migration.name, migration.description)
+        migration_success = False
+        migration_exception = None
+        try:
+            migration_success = await migration.upgrade(db)
+        except Exception as exc:
+            migration_exception = exc
+
+        if migration_success:
+            self.LOG.info('Successful aplyied upgrade %s', migration.name)
+        else:
+            self.LOG.error('Failed to apply upgrade %s: %s',
+                           migration.name, str(migration_exception))
+        try:
+            can_continue = await self._in_executor(
+                migration.after_upgrade, migration_exception)
+        except Exception as exc:
+            self.LOG.error('MIGRATION INTERRUPTED BY EXCEPTION %s', exc)
+            can_continue = False
+        return migration_success, can_continue
+
+    async def _in_executor(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(function, *args))
@@ -4,9 +4,19 @@ import os
 import time
 
 from src.migration_action import MigrationAction
+from src.migration_exception import MigrationException
+from src.migration_history import MigrationHistory
+from src.migration_operations import apply_operations, fuse_operations
+from src.migration_replay import WRITE_COMMANDS, CommandLog, CommandRecorder
+from src.migration_report import RunReport
 from src.migration_setup import MigrationSetup
-from src.migration_state import MigrationState
+from src.migration_state import MigrationState, MigrationStateData
+from src.migration_throttle import AdaptiveThrottle, ThrottledDatabase
+from src.migration_transaction import SessionDatabase
+from src.utils.async_database import run_downgrade, run_upgrade
+from src.utils.command_logger import CommandCounter
 from src.utils.logger import get_logger
+from src.utils.tracing import trace
 
 
 class CanaaMigrations:
@@ -16,6 +26,8 @@ class CanaaMigrations:
     def __init__(self, setup: MigrationSetup):
         self._setup: MigrationSetup = setup
         self._states = MigrationState(self._setup)
+        self._history = MigrationHistory(self._setup)
+        self.report: RunReport = None
 
     def generate(self) -> str:
         """ Generates a migration file and returns file name """
@@ -50,40 +62,122 @@ class CanaaMigrations:
             self.LOG.error(
                 'EXCEPTION on creating migration file: %s', str(exc))
 
-    def upgrade(self, until_name: str = None):
+    def upgrade(self, until_name: str = None, time_budget: float = None,
+                background: bool = False, max_ops_per_second: int = 1000,
+                target_p99_ms: int = 50, grouped: bool = False,
+                group_max_ops: int = 1000, group_max_ms: int = 5000) -> bool:
         """
         Executes upgrade until migration named until_name (inclusive).
-        If not informed, upgrades all migrations
+        If not informed, upgrades all migrations.
+        With time_budget (seconds), runs only migrations that fit in the budget,
+        estimated by their last upgrade_time: deferrable migrations
+        (and their dependents) are left to a later run, other migrations stop
+        the upgrade.
+        Online migrations (and their dependents) run only in background mode,
+        with writes capped by max_ops_per_second and adapted to p99 latency.
+        In grouped mode (replica sets), consecutive small migrations run in
+        multi-document transactions with their states, committed once per
+        group of at most group_max_ops commands and group_max_ms.
+        Returns False if any migration was unsuccessful
         """
+        self.report = self._new_report('upgrade')
+        with trace('canaa.upgrade', until=until_name, time_budget=time_budget,
+                   background=background, grouped=grouped) as span, self.report:
+            success = self._upgrade(until_name, time_budget, background,
+                                    max_ops_per_second, target_p99_ms,
+                                    (group_max_ops, group_max_ms) if grouped else None)
+            span.set_tag('success', success)
+        return success
+
+    def _upgrade(self, until_name, time_budget, background,
+                 max_ops_per_second, target_p99_ms, group_options) -> bool:
         self.LOG.info('Starting upgrade')
         t0 = time.time()
+        deadline = None if time_budget is None else t0 + time_budget
         just_applied = []
         successful_migrations = []
         unsuccessful_migrations = []
-        for migration in self._setup.migrations:
-            state = self._states.read_state(migration.name)
+        deferred_migrations = {}
+        not_run = []
+        fused = []
+        group = []
+        states = {state.name: state
+                  for state in self._states.read_states(
+                      [migration.name for migration in self._setup.migrations])}
+        for index, migration in enumerate(self._setup.migrations):
+            state = states.get(migration.name) or \
+                MigrationStateData({"_id": migration.name})
             if state.applied:
                 just_applied.append(migration.name)
+                migration.release()
                 continue
-            t1 = time.time()
-            migration_success, can_continue = self.apply_upgrade(migration)
-
-            if migration_success:
-                state.applied = datetime.datetime.now()
-                state.description = migration.description
-                state.running_time = int((time.time()-t1) * 1000)
-                self._states.write_state(state)
-                successful_migrations.append(migration.name)
-            else:
-                unsuccessful_migrations.append(migration.name)
 
-            if not can_continue:
-                self.LOG.warning(
-                    'Stopped next migrations by after_upgrade method result')
+            deferred_dependencies = [dependency for dependency in migration.dependencies
+                                     if dependency in deferred_migrations]
+            exceeded = deadline and self.budget_exceeded(
+                state, deadline - sum(self.estimated_time(s) for _, s in fused + group) / 1000)
+            if deferred_dependencies:
+                deferred_migrations[migration.name] = \
+                    'depends on deferred {0}'.format(deferred_dependencies)
+            elif migration.online and not background:
+                deferred_migrations[migration.name] = \
+                    'online migration, runs in background mode'
+            elif exceeded and migration.deferrable:
+                deferred_migrations[migration.name] = exceeded
+            elif exceeded:
+                self.LOG.warning('Stopped next migrations by time budget: %s %s',
+                                 migration.name, exceeded)
+                not_run = [m.name for m in self._setup.migrations[index:]
+                           if m.name not in states or not states[m.name].applied]
                 break
+            if migration.name in deferred_migrations:
+                migration.release()
+            else:
+                if migration.declarative and not migration.online:
+                    # Applied with next pending declarative migrations, fused
+                    can_continue = self._run_grouped(
+                        group, successful_migrations, unsuccessful_migrations,
+                        group_options)
+                    group = []
+                    if can_continue:
+                        fused.append((migration, state))
+                elif group_options and self.groupable(migration, state, group_options[1]):
+                    # Applied with next pending small migrations, in one transaction
+                    can_continue = self._run_upgrades(
+                        fused, successful_migrations, unsuccessful_migrations)
+                    fused = []
+                    if can_continue:
+                        group.append((migration, state))
+                else:
+                    can_continue = self._run_upgrades(
+                        fused, successful_migrations, unsuccessful_migrations) and \
+                        self._run_grouped(group, successful_migrations,
+                                          unsuccessful_migrations, group_options)
+                    fused = []
+                    group = []
+                    if can_continue:
+                        can_continue = self._run_upgrades(
+                            [(migration, state)], successful_migrations,
+                            unsuccessful_migrations, (max_ops_per_second, target_p99_ms))
+
+                if not can_continue:
+                    self.LOG.warning(
+                        'Stopped next migrations by after_upgrade method result')
+                    break
             if migration.name == until_name:
                 self.LOG.info('Stopped migrations until %s', until_name)
                 break
+
+        if not (self._run_upgrades(fused, successful_migrations, unsuccessful_migrations) and
+                self._run_grouped(group, successful_migrations, unsuccessful_migrations,
+                                  group_options)):
+            self.LOG.warning(
+                'Stopped next migrations by after_upgrade method result')
+        self._setup.save_checksums()
+        self._history.flush()
+        self.report.add_names(just_applied, 'previously_applied')
+        self.report.add_names(deferred_migrations, 'deferred')
+        self.report.add_names(not_run, 'not_run')
         if just_applied:
             self.LOG.info('PREVIOUSLY APPLIED: %s', just_applied)
         if unsuccessful_migrations:
@@ -91,13 +185,285 @@ class CanaaMigrations:
                           unsuccessful_migrations)
         if successful_migrations:
             self.LOG.info('SUCCESSFUL MIGRATIONS: %s', successful_migrations)
+        if deferred_migrations:
+            self.LOG.info('DEFERRED MIGRATIONS: %s', deferred_migrations)
+        if not_run:
+            self.LOG.info('NOT RUN BY TIME BUDGET: %s', not_run)
         self.LOG.info('Ending upgrade: %s ms', int((time.time()-t0)*1000))
+        return not unsuccessful_migrations
+
+    def _run_upgrades(self, migrations: list, successful: list, unsuccessful: list,
+                      throttle_options: tuple = None) -> bool:
+        """
+        Applies pending migrations [(migration, state)], writing their states.
+        Many (declarative) migrations are fused.
+        Returns False if next migrations can't continue
+        """
+        if not migrations:
+            return True
+        t1 = time.time()
+        with self._new_counter() as counter:
+            if len(migrations) > 1:
+                migration_success, can_continue = self.apply_fused_upgrade(
+                    [migration for migration, _ in migrations])
+            elif migrations[0][0].online and throttle_options:
+                max_ops_per_second, target_p99_ms = throttle_options
+                with AdaptiveThrottle(max_ops_per_second, target_p99_ms * 1000) as throttle:
+                    migration_success, can_continue = self.apply_upgrade(
+                        migrations[0][0], ThrottledDatabase(self._setup.db, throttle))
+            else:
+                migration_success, can_continue = self.apply_upgrade(migrations[0][0])
+        running_time = int((time.time()-t1) * 1000 / len(migrations))
+
+        # Commands of fused updates are split among fused migrations
+        for (migration, state), migration_counter in zip(
+                migrations, counter.split(len(migrations))):
+            self._record_run(migration.name, 'upgrade', running_time,
+                             migration_counter, migration_success)
+            if migration_success and migration.verifiable:
+                state.verification = self.verify_upgrade(migration)
+            migration.release()
+            if migration_success:
+                self.write_applied(migration, state, running_time)
+                successful.append(migration.name)
+            else:
+                unsuccessful.append(migration.name)
+        return can_continue
+
+    def groupable(self, migration: MigrationAction, state: MigrationStateData,
+                  max_ms: int) -> bool:
+        """
+        Small migration that can run in a grouped transaction: declared small,
+        or with a known estimate (stored estimate or last upgrade time) within max_ms
+        """
+        if migration.online or migration.async_upgrade or migration.verifiable:
+            return False
+        if migration.small:
+            return True
+        known = state.estimated_time is not None or state.upgrade_time is not None
+        return known and self.estimated_time(state) <= max_ms
 
-    def downgrade(self, keep_name: str = None):
+    def _run_grouped(self, migrations: list, successful: list, unsuccessful: list,
+                     group_options: tuple) -> bool:
+        """
+        Applies small migrations [(migration, state)] in transactions, one per
+        group bounded by (max_ops, max_ms). If a group fails, its migrations
+        and the next ones are applied one at a time.
+        Returns False if next migrations can't continue
+        """
+        if len(migrations) < 2:
+            return self._run_upgrades(migrations, successful, unsuccessful)
+        max_ops, max_ms = group_options
+        index = 0
+        can_continue = True
+        while index < len(migrations) and can_continue:
+            try:
+                applied, can_continue = self.apply_grouped_upgrade(
+                    migrations[index:], successful, max_ops, max_ms)
+            except Exception as exc:
+                self.LOG.warning('GROUPED TRANSACTION FAILED (%s), APPLYING ONE AT A TIME: %s',
+                                 exc, [m.name for m, _ in migrations[index:]])
+                for item in migrations[index:]:
+                    if not self._run_upgrades([item], successful, unsuccessful):
+                        return False
+                return True
+            index += applied
+        for migration, _ in migrations[index:]:
+            migration.release()
+        return can_continue
+
+    def apply_grouped_upgrade(self, migrations: list, successful: list,
+                              max_ops: int, max_ms: int) -> tuple:
+        """
+        Applies, in one transaction with their states, the first migrations
+        [(migration, state)] until max_ops commands or max_ms are reached.
+        after_upgrade methods are called after commit.
+        Raises on any failure (transaction is aborted).
+        Returns (number of applied migrations, can_continue)
+        """
+        names = [migration.name for migration, _ in migrations]
+        done = []
+        counters = {}
+        t0 = time.time()
+        with trace('canaa.group', name=names, operation='grouped_upgrade') as span, \
+                self._new_counter() as counter, \
+                self._setup.db.client.start_session() as session:
+            try:
+                with session.start_transaction():
+                    db = SessionDatabase(self._setup.db, session)
+                    for migration, state in migrations:
+                        snapshot = counter.snapshot()
+                        self._apply_in_transaction(migration, state, done, db)
+                        counters[migration.name] = counter.since(snapshot)
+                        if counter.commands >= max_ops or \
+                                (time.time() - t0) * 1000 >= max_ms:
+                            break
+            except Exception:
+                for migration, state, _ in done:
+                    state.applied = None
+                raise
+            span.set_tag('name', [migration.name for migration, _, _ in done])
+            span.set_tag('running_time', int((time.time()-t0)*1000))
+        self.LOG.info('Committed grouped upgrade %s',
+                      [migration.name for migration, _, _ in done])
+
+        can_continue = True
+        for migration, state, running_time in done:
+            try:
+                can_continue = migration.after_upgrade(None) and can_continue
+            except Exception as exc:
+                self.LOG.error('MIGRATION INTERRUPTED BY EXCEPTION %s', exc)
+                can_continue = False
+            migration.release()
+            self._record_run(migration.name, 'upgrade', running_time,
+                             counters[migration.name], True)
+            successful.append(migration.name)
+        return len(done), can_continue
+
+    def _apply_in_transaction(self, migration: MigrationAction,
+                              state: MigrationStateData, done: list, db):
+        grouped = [m.name for m, _, _ in done]
+        missing = [dependency for dependency in migration.dependencies
+                   if dependency not in grouped]
+        if missing and not self.can_upgrade(migration, missing):
+            raise MigrationException(
+                'Missing dependencies of {0}: {1}'.format(migration.name, missing))
+        self.LOG.info('Applying grouped upgrade %s: %s',
+                      migration.name, migration.description)
+        # One span per migration, child of the group (transaction) span
+        with trace('canaa.migration', name=migration.name,
+                   dependencies=migration.dependencies,
+                   operation='upgrade', grouped=True) as span:
+            t1 = time.time()
+            migration_success = migration.upgrade(db)
+            span.set_tag('success', bool(migration_success))
+            span.set_tag('running_time', int((time.time()-t1)*1000))
+        if not migration_success:
+            raise MigrationException(
+                'Migration {0} was unsuccessful'.format(migration.name))
+        running_time = int((time.time()-t1) * 1000)
+        self.write_applied(migration, state, running_time, db.session)
+        done.append((migration, state, running_time))
+
+    def apply_fused_upgrade(self, migrations: list) -> tuple:
+        """
+        Applies consecutive declarative migrations with one update per collection.
+        Returns (migration_success, can_continue)
+        """
+        names = [migration.name for migration in migrations]
+        external = []
+        for index, migration in enumerate(migrations):
+            external.extend(dependency for dependency in migration.dependencies
+                            if dependency not in names[:index])
+        applied = {state.name for state in self._states.iter_states(
+            external, True, ['_id'])} if external else set()
+        missing = [dependency for dependency in external if dependency not in applied]
+        if missing:
+            self.LOG.warning('MISSING DEPENDENCY MIGRATIONS FOR %s: %s',
+                             names, missing)
+            return False, False
+
+        self.LOG.info('Applying fused upgrade %s', names)
+        migration_exception = None
+        with trace('canaa.migration', name=names, operation='fused_upgrade') as span:
+            t0 = time.time()
+            try:
+                migration_success = apply_operations(self._setup.db, fuse_operations(
+                    [migration.operations for migration in migrations]))
+            except Exception as exc:
+                migration_success = False
+                migration_exception = exc
+                self.LOG.error('Failed to apply fused upgrade %s: %s',
+                               names, str(exc))
+            span.set_tag('success', migration_success)
+            span.set_tag('running_time', int((time.time()-t0)*1000))
+
+        can_continue = True
+        for migration in migrations:
+            try:
+                can_continue = migration.after_upgrade(migration_exception) and can_continue
+            except Exception as exc:
+                self.LOG.error('MIGRATION INTERRUPTED BY EXCEPTION %s', exc)
+                can_continue = False
+        return migration_success, can_continue
+
+    def verify_upgrade(self, migration: MigrationAction) -> dict:
+        """
+        Runs verify method of an upgraded migration.
+        Returns verification dict, stored in migration state.
+        A failed verification is logged, migration keeps applied
+        """
+        with trace('canaa.verify', name=migration.name) as span:
+            t0 = time.time()
+            try:
+                result = migration.verify(self._setup.db)
+            except Exception as exc:
+                result = {'ok': False, 'error': str(exc)}
+            if not isinstance(result, dict):
+                result = {'ok': bool(result)}
+            result.setdefault('ok', True)
+            result.setdefault('running_time', int((time.time()-t0)*1000))
+            span.set_tag('success', result['ok'])
+        if not result['ok']:
+            self.LOG.warning('VERIFICATION FAILED FOR %s: %s',
+                             migration.name, result)
+        return result
+
+    def write_applied(self, migration: MigrationAction, state: MigrationStateData,
+                      running_time: int, session=None):
+        state.applied = datetime.datetime.now()
+        state.description = migration.description
+        state.running_time = running_time
+        state.upgrade_time = running_time
+        state.checksum = self._setup.checksum(migration)
+        self._states.write_state(state, session)
+
+    def estimated_time(self, state: MigrationStateData) -> int:
+        """ Stored estimate or duration of last upgrade (0 if unknown) """
+        return state.estimated_time or state.upgrade_time or 0
+
+    def budget_exceeded(self, state: MigrationStateData, deadline: float) -> str:
+        """
+        Returns the reason why migration doesn't fit in time budget.
+        Running time is estimated by the stored estimate or the last upgrade_time
+        """
+        remaining = int((deadline - time.time()) * 1000)
+        if remaining <= 0:
+            return 'time budget exhausted'
+        estimated_time = self.estimated_time(state)
+        if estimated_time and estimated_time > remaining:
+            return 'estimated {0} ms exceeds remaining {1} ms'.format(
+                estimated_time, remaining)
+        return None
+
+    def downgrade(self, keep_name: str = None) -> bool:
         """
         Executes downgrade until migration named keep_name (exclusive)
         If not informed, downgrade all migrations
+        Returns False if any downgrade was unsuccessful
         """
+        self.report = self._new_report('downgrade')
+        with trace('canaa.downgrade', keep=keep_name) as span, self.report:
+            success = self._downgrade(keep_name)
+            span.set_tag('success', success)
+        return success
+
+    def _new_report(self, operation: str) -> RunReport:
+        return RunReport(operation, self._setup.db.name, self._setup.collection.name)
+
+    def _new_counter(self) -> CommandCounter:
+        """ Counter of migration body commands (state collection commands excluded) """
+        return CommandCounter(self._setup.db.name, self._setup.collection.name)
+
+    def _record_run(self, name: str, operation: str, running_time: int,
+                    counter: CommandCounter, success: bool):
+        """ Adds migration run to history and to the report of current run """
+        self._history.add(name, operation, running_time, counter, success)
+        if self.report:
+            self.report.add(name, 'successful' if success else 'unsuccessful',
+                            running_time, counter)
+
+    def _downgrade(self, keep_name: str) -> bool:
         self.LOG.info('Starting downgrade')
         t0 = time.time()
         dont_applied = []
@@ -111,9 +477,14 @@ class CanaaMigrations:
             state = self._states.read_state(migration.name)
             if not state.applied:
                 dont_applied.append(migration.name)
+                migration.release()
                 continue
             t1 = time.time()
-            migration_success, can_continue = self.apply_downgrade(migration)
+            with self._new_counter() as counter:
+                migration_success, can_continue = self.apply_downgrade(migration)
+            migration.release()
+            self._record_run(migration.name, 'downgrade',
+                             int((time.time()-t1)*1000), counter, migration_success)
 
             if migration_success:
                 state.applied = None
@@ -131,6 +502,8 @@ class CanaaMigrations:
                 break
 
         self._setup.migrations.reverse()
+        self._history.flush()
+        self.report.add_names(dont_applied, 'not_applied')
         if dont_applied:
             self.LOG.info('DON´T APPLIED MIGRATIONS: %s', dont_applied)
         if unsuccessful_downgrades:
@@ -139,8 +512,132 @@ class CanaaMigrations:
         if successful_downgrades:
             self.LOG.info('SUCCESSFUL DOWNGRADES: %s', successful_downgrades)
         self.LOG.info('Ending downgrade: %s ms', int((time.time()-t0)*1000))
+        return not unsuccessful_downgrades
 
-    def apply_upgrade(self, migration: MigrationAction) -> bool:
+    def verify(self) -> dict:
+        """
+        Compares applied migrations against migrations files.
+        Returns a dict with lists of names:
+        drifted: applied, but file content changed after applying
+        missing: file exists, but migration is not applied
+        orphaned: applied, but file doesn't exist
+        unchecked: applied without stored checksum
+        """
+        states = {state.name: state
+                  for state in self._states.read_all_states()}
+        drifted = []
+        missing = []
+        unchecked = []
+        for migration in self._setup.migrations:
+            state = states.pop(migration.name, None)
+            if not (state and state.applied):
+                missing.append(migration.name)
+            elif not state.checksum:
+                unchecked.append(migration.name)
+            elif state.checksum != self._setup.checksum(migration):
+                drifted.append(migration.name)
+        orphaned = [name for name, state in states.items() if state.applied]
+        self._setup.save_checksums()
+
+        if drifted:
+            self.LOG.warning('DRIFTED MIGRATIONS: %s', drifted)
+        if orphaned:
+            self.LOG.warning('ORPHANED MIGRATIONS: %s', orphaned)
+        return {'drifted': drifted,
+                'missing': missing,
+                'orphaned': orphaned,
+                'unchecked': unchecked}
+
+    def status(self) -> dict:
+        """
+        Compares migrations names (without loading modules, if setup didn't)
+        and database in one projection-only query.
+        Returns a dict with lists of names:
+        pending: not applied migrations
+        applied: applied migrations
+        orphaned: applied in database, but missing in migrations folder
+        """
+        applied_names = {state.name
+                         for state in self._states.iter_states(applied=True,
+                                                               projection=['_id'])}
+        names = self._setup.migration_names()
+        known = set(names)
+        return {'pending': [name for name in names if name not in applied_names],
+                'applied': [name for name in names if name in applied_names],
+                'orphaned': sorted(applied_names - known)}
+
+    def record(self, name: str) -> CommandLog:
+        """
+        Applies a deterministic migration, recording its write commands
+        into a compacted CommandLog
+        """
+        migration = next((m for m in self._setup.migrations if m.name == name), None)
+        if not migration:
+            raise MigrationException('Migration {0} not found'.format(name))
+        if not migration.deterministic:
+            raise MigrationException(
+                'Migration {0} is not deterministic'.format(name))
+        state = self._states.read_state(name)
+        if state.applied:
+            raise MigrationException(
+                'Migration {0} is already applied'.format(name))
+
+        with CommandRecorder(self._setup.db.name, WRITE_COMMANDS, writes_only=True) as recorder:
+            t0 = time.time()
+            migration_success, _ = self.apply_upgrade(migration)
+            running_time = int((time.time()-t0) * 1000)
+        migration.release()
+        if not migration_success:
+            raise MigrationException(
+                'Migration {0} was unsuccessful'.format(name))
+        self.write_applied(migration, state, running_time)
+        self._setup.save_checksums()
+
+        return CommandLog(name, migration.description, migration.dependencies,
+                          state.checksum, self._setup.db.name,
+                          recorder.commands).compact()
+
+    def replay(self, log: CommandLog) -> bool:
+        """
+        Applies a recorded migration without importing or running its module
+        """
+        state = self._states.read_state(log.name)
+        if state.applied:
+            self.LOG.info('PREVIOUSLY APPLIED: %s', log.name)
+            return True
+        applied = {s.name for s in self._states.iter_states(
+            log.dependencies, True, ['_id'])}
+        missing = [name for name in log.dependencies if name not in applied]
+        if missing:
+            self.LOG.warning('MISSING DEPENDENCY MIGRATIONS FOR %s: %s',
+                             log.name, missing)
+            return False
+
+        self.LOG.info('Replaying %s: %s commands', log.name, len(log.commands))
+        try:
+            running_time = log.replay(self._setup.db)
+        except Exception as exc:
+            self.LOG.error('Failed to replay %s: %s', log.name, str(exc))
+            return False
+        state.applied = datetime.datetime.now()
+        state.description = log.description
+        state.running_time = running_time
+        state.checksum = log.checksum
+        self._states.write_state(state)
+        self.LOG.info('Successful replayed %s: %s ms', log.name, running_time)
+        return True
+
+    def apply_upgrade(self, migration: MigrationAction, db=None) -> bool:
+        with trace('canaa.migration', name=migration.name,
+                   dependencies=migration.dependencies,
+                   operation='upgrade') as span:
+            t0 = time.time()
+            migration_success, can_continue = self._apply_upgrade(migration, db)
+            span.set_tag('success', bool(migration_success))
+            span.set_tag('running_time', int((time.time()-t0)*1000))
+        return migration_success, can_continue
+
+    def _apply_upgrade(self, migration: MigrationAction, db=None) -> bool:
         if not self.can_upgrade(migration):
             self.LOG.warning('MIGRATION INTERRUPTED')
             return False, False
@@ -151,7 +648,9 @@ class CanaaMigrations:
         can_continue = False
         can_continue_exception = None
         try:
-            migration_success = migration.upgrade(self._setup.db)
+            migration_success = run_upgrade(
+                migration, db if db is not None else self._setup.db,
+                self._setup.mongodb_uri)
         except Exception as exc:
             migration_exception = exc
 
@@ -179,13 +678,17 @@ class CanaaMigrations:
 
         return migration_success, can_continue
 
-    def can_upgrade(self, migration: MigrationAction) -> bool:
-        """ Can upgrade only if all dependency migrations are applied """
-        if not migration.dependencies:
+    def can_upgrade(self, migration: MigrationAction, dependencies: list = None) -> bool:
+        """
+        Can upgrade only if all dependency migrations are applied
+        (or dependencies, a subset of them)
+        """
+        dependencies = migration.dependencies if dependencies is None else dependencies
+        if not dependencies:
             return True
-        states = self._states.read_states(migration.dependencies)
+        states = self._states.read_states(dependencies)
         missing = []
-        for dependency in migration.dependencies:
+        for dependency in dependencies:
             found = False
             for state in states:
                 if state.name == dependency and state.applied:
@@ -200,6 +703,16 @@ class CanaaMigrations:
         return not missing
 
     def apply_downgrade(self, migration: MigrationAction) -> bool:
+        with trace('canaa.migration', name=migration.name,
+                   dependencies=migration.dependencies,
+                   operation='downgrade') as span:
+            t0 = time.time()
+            migration_success, can_continue = self._apply_downgrade(migration)
+            span.set_tag('success', bool(migration_success))
+            span.set_tag('running_time', int((time.time()-t0)*1000))
+        return migration_success, can_continue
+
+    def _apply_downgrade(self, migration: MigrationAction) -> bool:
         if not self.can_downgrade(migration):
             self.LOG.warning('DOWNGRADE INTERRUPTED')
             return False, False
@@ -210,7 +723,8 @@ class CanaaMigrations:
         can_continue = False
         can_continue_exception = None
         try:
-            migration_success = migration.downgrade(self._setup.db)
+            migration_success = run_downgrade(migration, self._setup.db,
+                                              self._setup.mongodb_uri)
         except Exception as exc:
             migration_exception = exc
 
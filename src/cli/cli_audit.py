@@ -0,0 +1,33 @@
+from src.cli.read_setup import setup_from_args
+from src.migration_audit import MigrationAuditor
+
+# Apart from argparse usage errors (2)
+EXIT_FINDINGS = 10
+
+
+def cli_audit(args):
+    """ Exit codes: 0 no findings, 1 error, 10 findings """
+
+    try:
+        setup = setup_from_args(args)
+        auditor = MigrationAuditor(setup, args.scratch_uri)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+
+    try:
+        findings = auditor.audit(args.names, args.sample_size)
+    except Exception as exc:
+        print('Error on audit: '+str(exc))
+        return 1
+
+    for name, migration_findings in findings.items():
+        print('{0} {1}'.format(name, 'OK' if not migration_findings else
+                               '{0} FINDINGS'.format(len(migration_findings))))
+        for finding in migration_findings:
+            print('    {stage:8} {command} {collection} filter={filter} sort={sort}'.format(
+                **finding))
+
+    if any(findings.values()):
+        return EXIT_FINDINGS
+    return 0
@@ -0,0 +1,22 @@
+from src.cli.read_setup import setup_from_args
+from src.migration_bundle import MigrationBundle
+
+
+def cli_bundle(args):
+
+    try:
+        setup = setup_from_args(args, True, ignore_bundle=True)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+    if not setup.is_ok:
+        print('Invalid migrations package {0}'.format(setup.migrations_package))
+        return 1
+
+    filename = args.output or setup.migrations_package + '.bundle'
+    bundle = MigrationBundle.build(setup.migrations_package,
+                                   setup.migrations,
+                                   setup.checksum)
+    bundle.save(filename)
+    print('BUNDLE {0}: {1} migrations'.format(filename, len(bundle.names)))
+    return 0
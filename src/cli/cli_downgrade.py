@@ -1,2 +1,19 @@
+from src.canaa_migrations import CanaaMigrations
+from src.cli.cli_upgrade import save_report
+from src.cli.read_setup import setup_from_args
+
+
 def cli_downgrade(args):
-    print(f'DOWNGRADE: {args}')
\ No newline at end of file
+
+    try:
+        setup = setup_from_args(args)
+        if not setup.is_ok:
+            raise Exception('invalid migrations setup')
+        migrations = CanaaMigrations(setup)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+
+    success = migrations.downgrade(args.keep)
+    save_report(migrations, args)
+    return 0 if success else 1
@@ -0,0 +1,25 @@
+from src.cli.read_setup import setup_from_args
+from src.migration_estimate import MigrationEstimator
+
+
+def cli_estimate(args):
+
+    try:
+        setup = setup_from_args(args)
+        estimator = MigrationEstimator(setup, args.scratch_uri)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+
+    try:
+        result = estimator.estimate(args.name, args.sample_size,
+                                    store=not args.no_store)
+    except Exception as exc:
+        print('Error on estimate: '+str(exc))
+        return 1
+
+    for key in ['name', 'collections', 'sampled_documents', 'total_documents',
+                'sample_time', 'commands', 'documents_per_second',
+                'estimated_commands', 'estimated_time']:
+        print('{0:22} {1}'.format(key.upper(), result[key]))
+    return 0
@@ -0,0 +1,51 @@
+from src.cli.read_setup import setup_from_args
+from src.migration_history import MigrationHistory
+
+# Apart from argparse usage errors (2)
+EXIT_REGRESSIONS = 10
+
+HISTORY_FIELDS = ['timestamp', 'name', 'operation', 'success', 'running_time',
+                  'commands', 'documents', 'database', 'host']
+
+
+def _history_from_args(args) -> MigrationHistory:
+    setup = setup_from_args(args, load_migrations=False)
+    if not setup.is_ok:
+        raise Exception('invalid migrations setup')
+    return MigrationHistory(setup)
+
+
+def _print_runs(runs: list, fields: list):
+    print(' '.join('{0:>12}'.format(field.upper()) for field in fields))
+    for run in runs:
+        print(' '.join('{0:>12}'.format(str(run.get(field))) for field in fields))
+
+
+def cli_history(args):
+
+    try:
+        runs = _history_from_args(args).runs(args.name, limit=args.limit,
+                                             database=args.database)
+    except Exception as exc:
+        print('Error on history: '+str(exc))
+        return 1
+
+    _print_runs(runs, HISTORY_FIELDS)
+    return 0
+
+
+def cli_regressions(args):
+    """ Exit codes: 0 no regressions, 1 error, 10 regressions found """
+    try:
+        regressions = _history_from_args(args).regressions(
+            args.name, args.recent, args.baseline, args.threshold, args.min_time,
+            args.by_database)
+    except Exception as exc:
+        print('Error on regressions: '+str(exc))
+        return 1
+
+    if not regressions:
+        print('NO REGRESSIONS')
+        return 0
+    _print_runs(regressions, HISTORY_FIELDS[:5] + ['baseline', 'ratio', 'database', 'host'])
+    return EXIT_REGRESSIONS
@@ -1,78 +1,139 @@
-from src.canaa_migrations import CanaaMigrations
+import csv
+import json
+import sys
+
 from src.cli.read_setup import setup_from_args
-from src.migration_setup import MigrationSetup
-from src.migration_state import MigrationState, MigrationStateData
+from src.migration_state import MigrationState
+
+DATE_TIME_WIDTH = 32
 
 
 def cli_list(args):
 
+    show_state = args.show_state or args.pending_only or args.applied_only
     try:
-        setup = setup_from_args(args, not args.show_state)
+        setup = setup_from_args(args, not show_state)
     except Exception as exc:
         print('Error on setup: '+str(exc))
+        return 1
+
+    migrations = setup.migrations
+    if show_state:
+        if args.format == 'table':
+            print('MIGRATIONS in {0} -> {1}:{2}/{3}'.format(setup.migrations_folder,
+                                                            setup.db.client.HOST,
+                                                            setup.db.client.PORT,
+                                                            setup.db.name))
+        heads = ('Name', 'Date/Time', 'Description')
+        widths = (max([len(heads[0])] + [len(m.name) for m in migrations]),
+                  DATE_TIME_WIDTH)
+        rows = state_rows(MigrationState(setup), migrations,
+                          args.pending_only, args.applied_only)
+    else:
+        if args.format == 'table':
+            print('MIGRATIONS IN {0}'.format(setup.migrations_folder))
+        heads = ('Name', 'Description')
+        widths = (max([len(heads[0])] + [len(m.name) for m in migrations]),)
+        rows = ((migration.name, migration.description)
+                for migration in migrations)
+
+    writer = WRITERS[args.format](heads, widths)
+    for row in rows:
+        writer.add(*row)
+    writer.close()
+    return 0
+
+
+def state_rows(states: MigrationState, migrations: list,
+               pending_only: bool = False, applied_only: bool = False):
+    """ Joins migrations and states through a name index, yielding rows """
+    names = [migration.name for migration in migrations]
+    if pending_only:
+        applied = {state.name
+                   for state in states.iter_states(names, True, ['_id'])}
+        for migration in migrations:
+            if migration.name not in applied:
+                yield migration.name, None, migration.description
         return
 
-    migrations = CanaaMigrations(setup)
-    states = MigrationState(setup)
-
-    if args.show_state:
-        print('MIGRATIONS in {0} -> {1}:{2}/{3}'.format(setup.migrations_folder,
-                                                        setup.db.client.HOST,
-                                                        setup.db.client.PORT,
-                                                        setup.db.name))
-
-        table = Table('Name', 'Date/Time', 'Description')
-    else:
-        print('MIGRATIONS IN {0}'.format(setup.migrations_folder))
-        table = Table('Name', 'Description')
-
-    migration_names = [
-        migration.name for migration in migrations._setup.migrations]
-    state_list = states.read_states(migration_names)
-    for migration in migrations._setup.migrations:
-        if args.show_state:
-            state = None
-            for stt in state_list:
-                if stt.name == migration.name:
-                    state = stt
-                    break
-            if not state:
-                state = MigrationStateData(
-                    {'_id': migration.name, 'description': migration.description})
-            table.add(state.name, state.applied, state.description)
-
-        else:
-            state = MigrationStateData(
-                {'_id': migration.name, 'description': migration.description})
-            table.add(migration.name, migration.description)
-
-    table.print()
+    index = {state.name: state
+             for state in states.iter_states(names,
+                                             True if applied_only else None,
+                                             ['applied', 'description'])}
+    for migration in migrations:
+        state = index.get(migration.name)
+        if state:
+            # States of estimated, never applied migrations have no description
+            yield state.name, state.applied, state.description or migration.description
+        elif not applied_only:
+            yield migration.name, None, migration.description
 
 
 class Table:
+    """ Streams rows in columns of fixed widths (last column is not padded) """
 
-    def __init__(self, *heads):
+    def __init__(self, heads, widths):
         self.heads = heads
-        self.max = [len(heads[i]) for i in range(len(heads))]
-        self.lines = []
+        self.widths = list(widths) + [len(heads[-1])]
+        self.started = False
 
     def add(self, *data):
-        if len(data) != len(self.max):
+        if len(data) != len(self.heads):
             return
-        line = []
-        for i, k in enumerate(data):
-            k = str(k)
-            self.max[i] = max(self.max[i], len(k))
-            line.append(k)
-
-        self.lines.append(line)
-
-    def print(self):
-        print(' '.join([self.heads[i].ljust(self.max[i])
-                        for i in range(len(self.max))]))
-
-        print(' '.join(['='*i for i in self.max]))
-        for line in self.lines:
-            print(' '.join([line[i].ljust(self.max[i])
-                            for i in range(len(self.max))]))
-        print(' '.join(['='*i for i in self.max]))
+        if not self.started:
+            self._print_head()
+        print(self._line([str(k) for k in data]))
+
+    def close(self):
+        if not self.started:
+            self._print_head()
+        print(self._separator())
+
+    def _print_head(self):
+        self.started = True
+        print(self._line(self.heads))
+        print(self._separator())
+
+    def _line(self, line):
+        return ' '.join([line[i].ljust(self.widths[i])
+                         for i in range(len(self.widths) - 1)] + [line[-1]])
+
+    def _separator(self):
+        return ' '.join(['='*i for i in self.widths])
+
+
+class JsonWriter:
+    """ Streams rows as JSON objects, one per line """
+
+    def __init__(self, heads, widths=None):
+        self.keys = [head.lower().replace('/', '_') for head in heads]
+
+    def add(self, *data):
+        print(json.dumps(dict(zip(self.keys, data)), default=json_default))
+
+    def close(self):
+        sys.stdout.flush()
+
+
+def json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class CsvWriter:
+
+    def __init__(self, heads, widths=None):
+        self.writer = csv.writer(sys.stdout)
+        self.writer.writerow(heads)
+
+    def add(self, *data):
+        self.writer.writerow(['' if k is None else k for k in data])
+
+    def close(self):
+        sys.stdout.flush()
+
+
+WRITERS = {'table': Table,
+           'json': JsonWriter,
+           'csv': CsvWriter}
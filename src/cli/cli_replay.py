@@ -0,0 +1,56 @@
+from src.canaa_migrations import CanaaMigrations
+from src.cli.read_setup import setup_from_args
+from src.migration_replay import CommandLog
+from src.migration_setup import MigrationSetup
+
+
+def cli_record(args):
+
+    try:
+        setup = setup_from_args(args)
+        migrations = CanaaMigrations(setup)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+
+    try:
+        log = migrations.record(args.name)
+    except Exception as exc:
+        print('Error on record: '+str(exc))
+        return 1
+
+    filename = args.output or args.name + '.replay'
+    log.save(filename)
+    print('RECORDED {0}: {1} commands'.format(filename, len(log.commands)))
+    return 0
+
+
+def cli_replay(args):
+
+    try:
+        logs = [CommandLog.load(filename) for filename in args.files]
+    except Exception as exc:
+        print('Error on loading command logs: '+str(exc))
+        return 1
+
+    targets = args.target or [None]
+    exit_code = 0
+    for target in targets:
+        try:
+            if target:
+                setup = MigrationSetup(target, args.migrations_package,
+                                       args.migrations_collection,
+                                       load_migrations=False)
+            else:
+                setup = setup_from_args(args, load_migrations=False)
+            migrations = CanaaMigrations(setup)
+        except Exception as exc:
+            print('Error on setup {0}: {1}'.format(target, str(exc)))
+            exit_code = 1
+            continue
+
+        for log in logs:
+            if not migrations.replay(log):
+                exit_code = 1
+                break
+    return exit_code
@@ -0,0 +1,36 @@
+from src.canaa_migrations import CanaaMigrations
+from src.cli.read_setup import setup_from_args
+
+EXIT_UP_TO_DATE = 0
+EXIT_ERROR = 1
+# Apart from argparse usage errors (2)
+EXIT_PENDING = 10
+EXIT_ORPHANED = 11
+
+
+def cli_status(args):
+    """
+    Exit codes: 0 up to date, 1 error, 10 pending migrations,
+    11 orphaned migrations (applied, but missing in migrations folder).
+    Migrations modules aren't imported, only their names are read
+    """
+    try:
+        setup = setup_from_args(args, load_migrations=False)
+        if not setup.is_ok:
+            raise Exception('invalid migrations setup')
+        result = CanaaMigrations(setup).status()
+    except Exception as exc:
+        print('Error on status: '+str(exc))
+        return EXIT_ERROR
+
+    for key in ['pending', 'applied', 'orphaned']:
+        print('{0:10} {1}'.format(key.upper(), len(result[key])))
+        if key != 'applied' and not args.quiet:
+            for name in result[key]:
+                print('           {0}'.format(name))
+
+    if result['orphaned']:
+        return EXIT_ORPHANED
+    if result['pending']:
+        return EXIT_PENDING
+    return EXIT_UP_TO_DATE
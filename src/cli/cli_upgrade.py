@@ -1,2 +1,37 @@
+from src.async_canaa_migrations import AsyncCanaaMigrations
+from src.canaa_migrations import CanaaMigrations
+from src.cli.read_setup import setup_from_args
+
+
+def save_report(migrations, args):
+    if getattr(args, 'report', None) and migrations.report:
+        try:
+            migrations.report.save(args.report)
+        except Exception as exc:
+            print('Error on saving report: '+str(exc))
+
+
 def cli_upgrade(args):
-    print(f'UPGRADE: {args}')
\ No newline at end of file
+
+    try:
+        setup = setup_from_args(args)
+        if getattr(args, 'async_engine', False):
+            migrations = AsyncCanaaMigrations(setup, args.concurrency)
+        else:
+            migrations = CanaaMigrations(setup)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return 1
+
+    if getattr(args, 'async_engine', False):
+        success = migrations.run(args.until)
+    else:
+        success = migrations.upgrade(args.until, args.time_budget,
+                                     background=args.background,
+                                     max_ops_per_second=args.max_ops,
+                                     target_p99_ms=args.target_p99_ms,
+                                     grouped=args.grouped,
+                                     group_max_ops=args.group_max_ops,
+                                     group_max_ms=args.group_max_ms)
+    save_report(migrations, args)
+    return 0 if success else 1
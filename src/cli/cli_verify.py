@@ -0,0 +1,38 @@
+from src.canaa_migrations import CanaaMigrations
+from src.cli.read_setup import setup_from_args
+
+EXIT_VERIFIED = 0
+EXIT_ERROR = 1
+# Apart from argparse usage errors (2)
+EXIT_DRIFTED = 10
+EXIT_ORPHANED = 11
+
+
+def cli_verify(args):
+    """
+    Exit codes: 0 verified, 1 error, 10 drifted migrations (applied file changed),
+    11 orphaned migrations (applied, but missing in migrations folder)
+    """
+
+    try:
+        setup = setup_from_args(args)
+    except Exception as exc:
+        print('Error on setup: '+str(exc))
+        return EXIT_ERROR
+
+    result = CanaaMigrations(setup).verify()
+
+    print('VERIFY {0} -> {1}:{2}/{3}'.format(setup.migrations_folder,
+                                            setup.db.client.HOST,
+                                            setup.db.client.PORT,
+                                            setup.db.name))
+    for key in ['drifted', 'missing', 'orphaned', 'unchecked']:
+        print('{0:10} {1}'.format(key.upper(), len(result[key])))
+        for name in result[key]:
+            print('           {0}'.format(name))
+
+    if result['orphaned']:
+        return EXIT_ORPHANED
+    if result['drifted']:
+        return EXIT_DRIFTED
+    return EXIT_VERIFIED
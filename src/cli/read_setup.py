@@ -23,10 +23,17 @@ def setup_from_env() -> MigrationSetup:
     migrations_package = os.getenv('MIGRATIONS_PACKAGE', 'migrations')
     migrations_collection = os.getenv(
         'MIGRATIONS_COLLECTION', 'canaa_migrations')
-    return MigrationSetup(mongodb_uri, migrations_package, migrations_collection)
+    bundle_file = os.getenv('MIGRATIONS_BUNDLE', None)
+    history_collection = os.getenv('MIGRATIONS_HISTORY_COLLECTION', None)
+    load_workers = int(os.getenv('MIGRATIONS_LOAD_WORKERS', 1))
+    return MigrationSetup(mongodb_uri, migrations_package, migrations_collection,
+                          bundle_file, load_workers=load_workers,
+                          history_collection=history_collection)
 
 
-def setup_from_args(args, ignore_mongodb: bool = False) -> MigrationSetup:
+def setup_from_args(args, ignore_mongodb: bool = False,
+                    ignore_bundle: bool = False,
+                    load_migrations: bool = True) -> MigrationSetup:
     mig_coll = getattr(args, 'migrations_collection', None)
     if not mig_coll:
         raise MigrationException('Migrations collection is missing')
@@ -50,4 +57,9 @@ def setup_from_args(args, ignore_mongodb: bool = False) -> MigrationSetup:
         uri_mongo = mongodb_uri+'/'+mongodb_database
         # LOG.warning('MongoDB URI read from environment: %s', uri_mongo)
 
-    return MigrationSetup(uri_mongo, mig_pack, mig_coll)
+    bundle_file = None if ignore_bundle else getattr(args, 'bundle', None)
+
+    return MigrationSetup(uri_mongo, mig_pack, mig_coll, bundle_file,
+                          load_migrations=load_migrations,
+                          load_workers=getattr(args, 'load_workers', None),
+                          history_collection=getattr(args, 'history_collection', None))
@@ -3,8 +3,38 @@
 # Include here the dependent previous migrations names (files)
 dependencies = []
 
+# Set True if this migration can be left to a later run
+# when it doesn't fit in upgrade --time-budget
+deferrable = False
+
+# Set True if this migration is small (few documents, no collection creation)
+# and can run with others in one transaction, by upgrade --grouped
+# (otherwise it's grouped only when its estimated time is known and small)
+small = False
+
+# Set True for data migrations that must run throttled, by upgrade --background
+# (db.throttle.batches(iterable) yields paced batches of documents)
+online = False
+
+# Set True if upgrade always issues the same commands, regardless of data
+# (it can be recorded once and replayed on other databases)
+deterministic = False
+
+# Collections affected by this migration (used by estimate)
+collections = []
+
 # Upgrade actions
 # db is an pymongo
+# Instead of upgrade, field operations by collection can be declared,
+# applied server side (consecutive declarative migrations are fused):
+# from src.migration_operations import Rename, SetDefault, Unset, Convert
+# operations = {'collection': [Rename('old', 'new'), SetDefault('field', 0)]}
+# upgrade and downgrade can be coroutines, receiving an async database
+# (upgrade --async runs independent migrations concurrently):
+# from src.utils.async_database import gather_limited
+# async def upgrade(db) -> bool:
+#     await gather_limited([db.collection.insert_many(batch) for batch in batches])
+#     return True
 def upgrade(db) -> bool:
     return True
 
@@ -23,3 +53,9 @@ def after_upgrade(raised_exception: Exception) -> bool:
 # Must return a boolean True if the migration process can continue
 def after_downgrade(raised_exception: Exception) -> bool:
     return True
+
+# verify (optional) is called after a successful upgrade
+# Returned dict (or bool as {'ok': ...}) is stored in the migration state
+# from src.migration_verifier import verify_collection
+# def verify(db) -> dict:
+#     return verify_collection(db, 'collection', required_fields=['field'])
@@ -1,29 +1,46 @@
 import importlib
 import inspect
+import sys
 
 from src.migration_exception import MigrationException
+from src.migration_operations import apply_operations, validate_operations
 
 
 class MigrationAction:
 
-    __slots__ = ['__ok', '__description', '__name',
+    __slots__ = ['__ok', '__description', '__name', '__file', '__module_file',
                  '__upgrade', '__downgrade', '__dependencies',
-                 '__after_upgrade', '__after_downgrade']
+                 '__after_upgrade', '__after_downgrade', '__deferrable',
+                 '__online', '__collections', '__deterministic',
+                 '__operations', '__declarative', '__verify', '__verifiable',
+                 '__async_upgrade', '__async_downgrade', '__small']
 
     def __init__(self, module_file):
         self.__ok = False
-        module = importlib.import_module(module_file)
+        self.__module_file = module_file
+        module = self._load()
+        self.__declarative = self.__operations is not None
+        self.__verifiable = self.__verify is not None
 
         self.__description = module.__doc__
         self.__name = module.__name__.split('.')[-1]
-        self.__upgrade = self._validate_method(module, 'upgrade')
-        self.__downgrade = self._validate_method(module, 'downgrade')
+        self.__file = getattr(module, '__file__', None)
         self.__dependencies = self._validate_field(
             module, 'dependencies', must_exists=False) or []
-        self.__after_upgrade = self._validate_method(
-            module, 'after_upgrade', must_exist=False) or (lambda x: True)
-        self.__after_downgrade = self._validate_method(
-            module, 'after_downgrade', must_exist=False) or (lambda x: True)
+        self.__deferrable = bool(self._validate_field(module, 'deferrable'))
+        self.__small = bool(self._validate_field(module, 'small'))
+        self.__online = bool(self._validate_field(module, 'online'))
+        if self.__online and self.__async_upgrade:
+            # Online upgrades are throttled through the sync database proxy
+            raise MigrationException(
+                'Migration module {0}: online migrations must have a sync upgrade'.format(module.__name__))
+        self.__deterministic = bool(
+            self._validate_field(module, 'deterministic'))
+        self.__collections = self._validate_field(module, 'collections')
+        if isinstance(self.__collections, str):
+            self.__collections = [self.__collections]
+        if not self.__collections and self.__declarative:
+            self.__collections = list(self.__operations.keys())
 
         if isinstance(self.__dependencies, str):
             self.__dependencies = [self.__dependencies]
@@ -43,14 +60,113 @@ class MigrationAction:
     def name(self) -> str:
         return self.__name
 
+    @property
+    def file(self) -> str:
+        return self.__file
+
     @property
     def dependencies(self) -> list:
         return self.__dependencies
 
+    @property
+    def deferrable(self) -> bool:
+        """ Migration can be left to a later run when out of time budget """
+        return self.__deferrable
+
+    @property
+    def small(self) -> bool:
+        """ Migration is declared small enough to run in a grouped transaction """
+        return self.__small
+
+    @property
+    def online(self) -> bool:
+        """ Data migration that runs throttled in background mode """
+        return self.__online
+
+    @property
+    def collections(self) -> list:
+        """ Collections affected by migration (None if not declared) """
+        return self.__collections
+
+    @property
+    def deterministic(self) -> bool:
+        """ Migration always issues the same commands (can be recorded and replayed) """
+        return self.__deterministic
+
+    @property
+    def declarative(self) -> bool:
+        """ Migration declares field operations instead of an upgrade method """
+        return self.__declarative
+
+    @property
+    def operations(self) -> dict:
+        """ Field operations by collection (None if not declarative) """
+        self._ensure_loaded()
+        return self.__operations
+
+    @property
+    def verifiable(self) -> bool:
+        """ Migration has a verify method, called after a successful upgrade """
+        return self.__verifiable
+
+    @property
+    def async_upgrade(self) -> bool:
+        """ upgrade is a coroutine function, receiving an async database """
+        return self.__async_upgrade
+
+    @property
+    def async_downgrade(self) -> bool:
+        """ downgrade is a coroutine function, receiving an async database """
+        return self.__async_downgrade
+
     @property
     def is_ok(self) -> bool:
         return self.__ok
 
+    @property
+    def is_loaded(self) -> bool:
+        return self.__upgrade is not None
+
+    def _load(self):
+        module = importlib.import_module(self.__module_file)
+        self.__operations = self._validate_operations(module)
+        if self.__operations is None:
+            self.__upgrade = self._validate_method(module, 'upgrade')
+        else:
+            operations = self.__operations
+            self.__upgrade = lambda db: apply_operations(db, operations)
+        self.__downgrade = self._validate_method(module, 'downgrade')
+        self.__after_upgrade = self._validate_method(
+            module, 'after_upgrade', must_exist=False) or default_after_done
+        self.__after_downgrade = self._validate_method(
+            module, 'after_downgrade', must_exist=False) or default_after_done
+        self.__verify = self._validate_method(
+            module, 'verify', must_exist=False)
+        self.__async_upgrade = inspect.iscoroutinefunction(self.__upgrade)
+        self.__async_downgrade = inspect.iscoroutinefunction(self.__downgrade)
+        return module
+
+    def release(self):
+        """
+        Drops references to module methods and unloads module from sys.modules.
+        Module is imported again if the migration runs later.
+        """
+        self.__upgrade = None
+        self.__downgrade = None
+        self.__after_upgrade = None
+        self.__after_downgrade = None
+        self.__verify = None
+        self.__operations = None
+        sys.modules.pop(self.__module_file, None)
+        package, _, child = self.__module_file.rpartition('.')
+        if package in sys.modules and hasattr(sys.modules[package], child):
+            delattr(sys.modules[package], child)
+
+    def _ensure_loaded(self) -> bool:
+        if self.__ok and not self.is_loaded:
+            self._load()
+        return self.__ok
+
     def _validate_method(self, module, method__name, argument_count=1, must_exist: bool = True):
         method = getattr(module, method__name, None)
         if callable(method) and len(inspect.signature(method).parameters) == argument_count:
@@ -61,6 +177,19 @@ class MigrationAction:
         raise MigrationException(
             'Migration module {0} must have an {1} method with {2} argument(s)'.format(module.__name__, method__name, argument_count))
 
+    def _validate_operations(self, module) -> dict:
+        operations = getattr(module, 'operations', None)
+        if operations is None:
+            return None
+        if getattr(module, 'upgrade', None) is not None:
+            raise MigrationException(
+                'Migration module {0} must have an upgrade method or operations, not both'.format(module.__name__))
+        try:
+            return validate_operations(operations)
+        except MigrationException as exc:
+            raise MigrationException(
+                'Migration module {0}: {1}'.format(module.__name__, exc))
+
     def _validate_field(self, module, field_name, must_exists=False):
         field = getattr(module, field_name, None)
         if field is None and must_exists:
@@ -69,20 +198,26 @@ class MigrationAction:
         return field
 
     def upgrade(self, db):
-        if self.__ok and self.__upgrade:
+        if self._ensure_loaded():
             return self.__upgrade(db)
 
     def downgrade(self, db):
-        if self.__ok and self.__downgrade:
+        if self._ensure_loaded():
             return self.__downgrade(db)
 
     def after_upgrade(self, raised_exception: Exception):
-        if self.__ok:
+        if self._ensure_loaded():
             return self.__after_upgrade(raised_exception)
         return True
 
+    def verify(self, db):
+        """ Verification result (None if migration has no verify method) """
+        if self._ensure_loaded() and self.__verify:
+            return self.__verify(db)
+        return None
+
     def after_downgrade(self, raised_exception: Exception):
-        if self.__ok:
+        if self._ensure_loaded():
             return self.__after_downgrade(raised_exception)
         return True
 
@@ -0,0 +1,156 @@
+import json
+
+from src.migration_action import MigrationAction
+from src.migration_replay import CommandRecorder
+from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationState
+from src.scratch_database import ScratchDatabase
+from src.utils.async_database import run_upgrade
+from src.utils.logger import get_logger
+
+AUDITED_COMMANDS = ['find', 'aggregate', 'update', 'delete',
+                    'findAndModify', 'count', 'distinct']
+
+STATEMENT_FIELDS = {'update': 'updates', 'delete': 'deletes'}
+
+
+class MigrationAuditor:
+    """
+    Runs pending migrations against a sampled scratch database, explaining
+    their read and write commands to find collection scans and in-memory sorts
+    """
+
+    LOG = get_logger()
+
+    def __init__(self, setup: MigrationSetup, scratch_uri: str = None):
+        """
+        :param scratch_uri: str MongoDB URI of scratch server (default: migrations server)
+        """
+        self._setup = setup
+        self._scratch_uri = scratch_uri
+        self._states = MigrationState(setup)
+
+    def pending_migrations(self, names: list = None) -> list:
+        applied = {state.name for state in self._states.iter_states(
+            [m.name for m in self._setup.migrations], True, ['_id'])}
+        return [migration for migration in self._setup.migrations
+                if migration.name not in applied
+                and (not names or migration.name in names)]
+
+    def audit(self, names: list = None, sample_size: int = 1000,
+              max_examples: int = 5) -> dict:
+        """
+        Returns {migration name: [findings]}, each finding a dict with
+        command, collection, stage (COLLSCAN or SORT), filter and sort
+        """
+        migrations = self.pending_migrations(names)
+        collections = self._affected_collections(migrations)
+        findings = {}
+        with ScratchDatabase(self._setup.db, collections, sample_size,
+                             self._scratch_uri) as scratch:
+            for migration in migrations:
+                findings[migration.name] = self.audit_migration(
+                    migration, scratch.db, max_examples)
+        return findings
+
+    def audit_migration(self, migration: MigrationAction, db,
+                        max_examples: int = 5) -> list:
+        with CommandRecorder(db.name, AUDITED_COMMANDS) as recorder:
+            try:
+                run_upgrade(migration, db, self._scratch_uri or self._setup.mongodb_uri)
+            except Exception as exc:
+                self.LOG.warning('AUDIT OF %s RAISED %s', migration.name, exc)
+        migration.release()
+
+        findings = []
+        seen = set()
+        for command in explainable_commands(recorder.commands):
+            for finding in self.explain(db, command):
+                key = (finding['command'], finding['collection'],
+                       finding['stage'], json.dumps(shape(finding['filter']),
+                                                    sort_keys=True))
+                if key in seen or len(findings) >= max_examples:
+                    continue
+                seen.add(key)
+                findings.append(finding)
+        if findings:
+            self.LOG.warning('AUDIT %s: %s', migration.name, findings)
+        return findings
+
+    def explain(self, db, command: dict) -> list:
+        command_name = next(iter(command))
+        try:
+            result = db.command({'explain': command,
+                                 'verbosity': 'queryPlanner'})
+        except Exception as exc:
+            self.LOG.debug('EXPLAIN %s FAILED: %s', command_name, exc)
+            return []
+
+        findings = []
+        for stage in plan_stages(result):
+            if stage.get('stage') not in ['COLLSCAN', 'SORT']:
+                continue
+            findings.append({'command': command_name,
+                             'collection': command[command_name],
+                             'stage': stage['stage'],
+                             'filter': command_filter(command),
+                             'sort': stage.get('sortPattern')})
+        return findings
+
+    def _affected_collections(self, migrations: list) -> list:
+        collections = set()
+        for migration in migrations:
+            if not migration.collections:
+                return self._setup.data_collection_names()
+            collections.update(migration.collections)
+        return sorted(collections)
+
+
+def explainable_commands(commands: list):
+    """ Splits multi-statement update/delete commands (explain accepts one) """
+    for command in commands:
+        command_name = next(iter(command))
+        field = STATEMENT_FIELDS.get(command_name)
+        if not field:
+            yield command
+            continue
+        for statement in command.get(field, []):
+            yield {command_name: command[command_name], field: [statement]}
+
+
+def command_filter(command: dict) -> dict:
+    command_name = next(iter(command))
+    if command_name == 'find':
+        return command.get('filter', {})
+    if command_name in STATEMENT_FIELDS:
+        return command[STATEMENT_FIELDS[command_name]][0].get('q', {})
+    if command_name == 'aggregate':
+        for stage in command.get('pipeline', []):
+            if '$match' in stage:
+                return stage['$match']
+        return {}
+    return command.get('query', {})
+
+
+def plan_stages(plan):
+    """ Yields every stage dict of an explain result """
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan
+        for key, value in plan.items():
+            if key == 'rejectedPlans':
+                continue
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def shape(query):
+    """ Query with values replaced by 1, to group findings by filter shape """
+    if isinstance(query, dict):
+        return {key: shape(value) if key.startswith('$') or isinstance(value, dict)
+                else 1 for key, value in query.items()}
+    if isinstance(query, list):
+        return [shape(item) for item in query]
+    return 1
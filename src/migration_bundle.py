@@ -0,0 +1,139 @@
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import marshal
+import os
+import sys
+
+from src.migration_exception import MigrationException
+
+BUNDLE_FORMAT = 1
+
+
+class MigrationBundle:
+    """
+    Single file archive with precompiled code objects of a migrations package
+    and the manifest metadata (description, dependencies, checksum)
+    """
+
+    def __init__(self, package: str, modules: dict):
+        """
+        :param package: str 'migrations'
+        :param modules: dict {name: {'code', 'file', 'checksum', ...}}
+        """
+        self.__package = package
+        self.__modules = modules
+        self.__importer = None
+
+    @property
+    def package(self) -> str:
+        return self.__package
+
+    @property
+    def names(self) -> list:
+        return sorted(self.__modules.keys())
+
+    @property
+    def module_names(self) -> list:
+        return [self.__package+'.'+name for name in self.names]
+
+    def manifest(self, name: str) -> dict:
+        module = self.__modules.get(name, {})
+        return {key: value for key, value in module.items() if key != 'code'}
+
+    def checksum(self, name: str) -> str:
+        return self.__modules.get(name, {}).get('checksum', None)
+
+    def code(self, name: str):
+        return self.__modules[name]['code']
+
+    @classmethod
+    def build(cls, package: str, migrations: list, checksum=None):
+        """
+        Compiles migrations files
+        :param migrations: list of MigrationAction
+        :param checksum: callable(migration) -> str
+        """
+        modules = {}
+        for migration in migrations:
+            with open(migration.file, 'rb') as f:
+                source = f.read()
+            modules[migration.name] = {
+                'code': compile(source, migration.file, 'exec',
+                                dont_inherit=True),
+                'file': migration.file,
+                'description': migration.description,
+                'dependencies': migration.dependencies,
+                'checksum': checksum(migration) if checksum else None
+            }
+        return cls(package, modules)
+
+    def save(self, filename: str):
+        data = marshal.dumps({'format': BUNDLE_FORMAT,
+                              'magic': importlib.util.MAGIC_NUMBER,
+                              'package': self.__package,
+                              'modules': self.__modules})
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        try:
+            data = marshal.loads(data)
+        except Exception as exc:
+            raise MigrationException(
+                'Invalid migrations bundle {0}: {1}'.format(filename, exc))
+        if not isinstance(data, dict) or data.get('format') != BUNDLE_FORMAT:
+            raise MigrationException(
+                'Invalid migrations bundle format {0}'.format(filename))
+        if data.get('magic') != importlib.util.MAGIC_NUMBER:
+            raise MigrationException(
+                'Migrations bundle {0} was built by another python version'.format(filename))
+        return cls(data['package'], data['modules'])
+
+    def install(self):
+        """ Registers importer for bundle modules """
+        if not self.__importer:
+            self.__importer = BundleImporter(self)
+            sys.meta_path.insert(0, self.__importer)
+
+    def uninstall(self):
+        if self.__importer in sys.meta_path:
+            sys.meta_path.remove(self.__importer)
+        self.__importer = None
+
+
+class BundleImporter(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """ Imports migrations package and modules from a MigrationBundle """
+
+    def __init__(self, bundle: MigrationBundle):
+        self.__bundle = bundle
+        self.__prefix = bundle.package + '.'
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname == self.__bundle.package:
+            return importlib.machinery.ModuleSpec(fullname, self,
+                                                  is_package=True)
+        if not fullname.startswith(self.__prefix):
+            return None
+        name = fullname[len(self.__prefix):]
+        manifest = self.__bundle.manifest(name)
+        if not manifest:
+            return None
+        spec = importlib.machinery.ModuleSpec(fullname, self,
+                                              origin=manifest['file'])
+        spec.has_location = True
+        return spec
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        if module.__name__ == self.__bundle.package:
+            return
+        exec(self.__bundle.code(module.__name__[len(self.__prefix):]),
+             module.__dict__)
@@ -0,0 +1,80 @@
+import time
+
+from src.migration_action import MigrationAction
+from src.migration_exception import MigrationException
+from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationState
+from src.scratch_database import ScratchDatabase
+from src.utils.async_database import run_upgrade
+from src.utils.command_logger import CommandCounter
+from src.utils.logger import get_logger
+
+
+class MigrationEstimator:
+    """
+    Estimates running time of a migration by running its upgrade against
+    a sampled copy of the affected collections, extrapolating to full sizes
+    """
+
+    LOG = get_logger()
+
+    def __init__(self, setup: MigrationSetup, scratch_uri: str = None):
+        """
+        :param scratch_uri: str MongoDB URI of scratch server (default: migrations server)
+        """
+        self._setup = setup
+        self._scratch_uri = scratch_uri
+        self._states = MigrationState(setup)
+
+    def find_migration(self, name: str) -> MigrationAction:
+        for migration in self._setup.migrations:
+            if migration.name == name:
+                return migration
+        raise MigrationException('Migration {0} not found'.format(name))
+
+    def affected_collections(self, migration: MigrationAction) -> list:
+        if migration.collections:
+            return migration.collections
+        return self._setup.data_collection_names()
+
+    def estimate(self, name: str, sample_size: int = 1000,
+                 store: bool = True) -> dict:
+        """
+        Returns estimate dict:
+        sampled_documents, total_documents, sample_time (ms), commands,
+        documents_per_second, estimated_time (ms), estimated_commands
+        """
+        migration = self.find_migration(name)
+        collections = self.affected_collections(migration)
+        with ScratchDatabase(self._setup.db, collections, sample_size,
+                             self._scratch_uri) as scratch:
+            with CommandCounter(scratch.db.name) as counter:
+                t0 = time.time()
+                success = run_upgrade(migration, scratch.db,
+                                      self._scratch_uri or self._setup.mongodb_uri)
+                sample_time = time.time() - t0
+            migration.release()
+            sampled = scratch.sampled_documents
+            total = scratch.total_documents
+
+        if not success:
+            raise MigrationException(
+                'Migration {0} upgrade was unsuccessful on sample'.format(name))
+
+        ratio = total / sampled if sampled else 1
+        result = {
+            'name': name,
+            'collections': collections,
+            'sampled_documents': sampled,
+            'total_documents': total,
+            'sample_time': int(sample_time * 1000),
+            'commands': counter.commands,
+            'documents_per_second': int(sampled / sample_time) if sample_time else None,
+            'estimated_time': int(sample_time * ratio * 1000),
+            'estimated_commands': int(counter.commands * ratio)
+        }
+        self.LOG.info('ESTIMATE %s: %s', name, result)
+
+        if store:
+            self._states.write_estimate(name, result['estimated_time'])
+        return result
@@ -0,0 +1,132 @@
+import datetime
+import socket
+import statistics
+
+import pymongo
+
+from src.migration_setup import MigrationSetup
+from src.utils.command_logger import CommandCounter
+from src.utils.logger import get_logger
+
+HISTORY_SUFFIX = '_history'
+
+
+class MigrationHistory:
+    """
+    Run history of migrations, appended to a capped collection
+    (<migrations collection>_history, or the setup history_collection
+    '[database.]collection' shared by many databases). Entries are buffered
+    during a run and written with one insert_many by flush
+    """
+
+    LOG = get_logger()
+    HOST = socket.gethostname()
+
+    def __init__(self, setup: MigrationSetup, max_size: int = 16 * 1024 * 1024,
+                 max_entries: int = 100000):
+        self._setup = setup
+        self._max_size = max_size
+        self._max_entries = max_entries
+        self._created = False
+        self.entries = []
+
+    @property
+    def collection(self) -> pymongo.collection.Collection:
+        if self._setup.history_collection:
+            database, _, name = self._setup.history_collection.rpartition('.')
+            db = self._setup.db.client[database] if database else self._setup.db
+            return db[name]
+        return self._setup.db[self._setup.collection.name + HISTORY_SUFFIX]
+
+    def add(self, name: str, operation: str, running_time: int,
+            counter: CommandCounter, success: bool) -> dict:
+        entry = {'name': name,
+                 'database': self._setup.db.name,
+                 'operation': operation,
+                 'running_time': running_time,
+                 'commands': counter.commands if counter else None,
+                 'command_time': counter.duration_micros // 1000 if counter else None,
+                 'documents': counter.documents if counter else None,
+                 'host': self.HOST,
+                 'timestamp': datetime.datetime.now(datetime.timezone.utc),
+                 'success': success}
+        self.entries.append(entry)
+        return entry
+
+    def flush(self) -> int:
+        """ Writes buffered entries. History errors don't fail migrations """
+        entries, self.entries = self.entries, []
+        if not entries:
+            return 0
+        try:
+            self._ensure_collection()
+            self.collection.insert_many(entries, ordered=False)
+        except Exception as exc:
+            self.LOG.warning('RUN HISTORY NOT WRITTEN: %s', exc)
+            return 0
+        return len(entries)
+
+    def _ensure_collection(self):
+        if self._created:
+            return
+        name = self.collection.name
+        db = self.collection.database
+        if not db.list_collection_names(filter={'name': name}):
+            try:
+                db.create_collection(
+                    name, capped=True, size=self._max_size, max=self._max_entries)
+            except pymongo.errors.CollectionInvalid:
+                pass
+        self._created = True
+
+    def runs(self, name: str = None, operation: str = None,
+             limit: int = 0, database: str = None) -> list:
+        """ Entries, newest first """
+        query = {}
+        if name:
+            query['name'] = name
+        if operation:
+            query['operation'] = operation
+        if database:
+            query['database'] = database
+        return list(self.collection.find(query, {'_id': 0})
+                    .sort('$natural', pymongo.DESCENDING).limit(limit))
+
+    def regressions(self, name: str = None, recent: int = 1, baseline: int = 10,
+                    threshold: float = 2.0, min_time: int = 100,
+                    by_database: bool = False) -> list:
+        return find_regressions(list(reversed(self.runs(name, 'upgrade'))),
+                                recent, baseline, threshold, min_time, by_database)
+
+
+def find_regressions(runs: list, recent: int = 1, baseline: int = 10,
+                     threshold: float = 2.0, min_time: int = 100,
+                     by_database: bool = False) -> list:
+    """
+    Compares the last recent successful runs of each migration and operation
+    (runs oldest first) against the median running_time of the baseline runs
+    before them, across databases (tenants) or, by_database, per database.
+    Runs slower than threshold * median (and min_time ms) are flagged
+    """
+    by_migration = {}
+    for run in runs:
+        if run.get('success'):
+            key = (run['name'], run['operation'])
+            if by_database:
+                key += (run.get('database'),)
+            by_migration.setdefault(key, []).append(run)
+
+    regressions = []
+    for migration_runs in by_migration.values():
+        for index in range(max(1, len(migration_runs) - recent), len(migration_runs)):
+            previous = migration_runs[max(0, index - baseline):index]
+            median = statistics.median(run['running_time'] for run in previous)
+            run = migration_runs[index]
+            if run['running_time'] >= min_time and \
+                    run['running_time'] > threshold * median:
+                regression = dict(run)
+                regression['baseline'] = median
+                regression['ratio'] = round(run['running_time'] / median, 2) \
+                    if median else None
+                regressions.append(regression)
+    return regressions
@@ -0,0 +1,148 @@
+"""
+Declarative field operations for migrations.
+
+A migration module may declare, instead of an upgrade method:
+
+    operations = {
+        'users': [Rename('name', 'full_name'), SetDefault('active', True)]
+    }
+
+Operations of each collection are compiled into one server side
+update_many with an aggregation pipeline (MongoDB 4.2+).
+"""
+from src.migration_exception import MigrationException
+
+CONVERT_TYPES = ['double', 'string', 'objectId', 'bool', 'date',
+                 'int', 'long', 'decimal']
+
+
+def _validate_field(field: str) -> str:
+    if not isinstance(field, str) or not field or field.startswith('$'):
+        raise MigrationException('Invalid field name {0}'.format(field))
+    return field
+
+
+class FieldOperation:
+
+    def __init__(self, field: str):
+        self.field = _validate_field(field)
+
+    def filter(self) -> dict:
+        """ Query of documents changed by this operation """
+        raise NotImplementedError
+
+    def stages(self) -> list:
+        """ Aggregation pipeline stages of this operation """
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return type(self) == type(other) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, vars(self))
+
+
+class Rename(FieldOperation):
+
+    def __init__(self, field: str, new_name: str):
+        super().__init__(field)
+        self.new_name = _validate_field(new_name)
+
+    def filter(self) -> dict:
+        return {self.field: {'$exists': True}}
+
+    def stages(self) -> list:
+        # Documents without field (matched by other operations) keep new_name
+        return [{'$set': {self.new_name: {'$cond': [
+                    {'$eq': [{'$type': '$'+self.field}, 'missing']},
+                    '$'+self.new_name, '$'+self.field]}}},
+                {'$unset': self.field}]
+
+
+class SetDefault(FieldOperation):
+    """ Sets value on documents where field is missing or null """
+
+    def __init__(self, field: str, value):
+        super().__init__(field)
+        self.value = value
+
+    def filter(self) -> dict:
+        return {self.field: None}
+
+    def stages(self) -> list:
+        return [{'$set': {self.field: {'$ifNull': ['$'+self.field,
+                                                   {'$literal': self.value}]}}}]
+
+
+class Unset(FieldOperation):
+
+    def filter(self) -> dict:
+        return {self.field: {'$exists': True}}
+
+    def stages(self) -> list:
+        return [{'$unset': self.field}]
+
+
+class Convert(FieldOperation):
+    """ Converts field to type, keeping values that can't be converted """
+
+    def __init__(self, field: str, to_type: str):
+        super().__init__(field)
+        if to_type not in CONVERT_TYPES:
+            raise MigrationException('Invalid convert type {0}, expected one of {1}'.format(
+                to_type, CONVERT_TYPES))
+        self.to_type = to_type
+
+    def filter(self) -> dict:
+        return {self.field: {'$exists': True, '$not': {'$type': self.to_type}}}
+
+    def stages(self) -> list:
+        value = '$'+self.field
+        return [{'$set': {self.field: {'$convert': {'input': value,
+                                                    'to': self.to_type,
+                                                    'onError': value,
+                                                    'onNull': value}}}}]
+
+
+def validate_operations(operations) -> dict:
+    if not isinstance(operations, dict) or not operations:
+        raise MigrationException(
+            'operations must be a dict of collection name and list of operations')
+    for collection, collection_operations in operations.items():
+        if not isinstance(collection_operations, (list, tuple)) or \
+                not all(isinstance(op, FieldOperation) for op in collection_operations):
+            raise MigrationException(
+                'operations of {0} must be a list of field operations'.format(collection))
+    return operations
+
+
+def compile_operations(operations: list) -> tuple:
+    """
+    Returns (filter, pipeline) of update_many.
+    Filter matches any document changed by some operation. The pipeline runs
+    on every matched document, so the stages of each operation must leave
+    unchanged documents it doesn't apply to (e.g. Rename of a missing field).
+    """
+    filters = [operation.filter() for operation in operations]
+    query = filters[0] if len(filters) == 1 else {'$or': filters}
+    pipeline = [stage for operation in operations
+                for stage in operation.stages()]
+    return query, pipeline
+
+
+def fuse_operations(operations_list: list) -> dict:
+    """ Concatenates, in order, operations of many migrations by collection """
+    fused = {}
+    for operations in operations_list:
+        for collection, collection_operations in operations.items():
+            fused.setdefault(collection, []).extend(collection_operations)
+    return fused
+
+
+def apply_operations(db, operations: dict) -> bool:
+    """ Runs one update_many per collection """
+    for collection, collection_operations in operations.items():
+        if collection_operations:
+            query, pipeline = compile_operations(collection_operations)
+            db[collection].update_many(query, pipeline)
+    return True
@@ -0,0 +1,154 @@
+"""
+Server side data movement helpers for migrations.
+
+Copy, reshape and backfill are aggregation pipelines ending in $merge
+(or $out), so documents never cross the network to the migrator.
+Large jobs are split into _id ranges, run one by one, reporting progress.
+
+    from src.migration_pipelines import copy_collection
+
+    def upgrade(db) -> bool:
+        copy_collection(db, 'numbers_collection', 'numbers_backup', partitions=8)
+        return True
+"""
+import datetime
+import numbers
+import time
+
+from bson import ObjectId
+
+from src.migration_exception import MigrationException
+from src.utils.logger import get_logger
+
+LOG = get_logger()
+
+# BSON type aliases of _id values. $lt/$gte only match values of the same
+# type (all numeric types compare together); None: no range partitions
+ID_TYPES = [(bool, None), (numbers.Number, 'number'), (str, 'string'),
+            (ObjectId, 'objectId'), (datetime.datetime, 'date')]
+
+
+def log_progress(done: int, total: int, elapsed: float):
+    LOG.info('PIPELINE PROGRESS: %s/%s partitions in %s ms',
+             done, total, int(elapsed * 1000))
+
+
+def id_boundaries(collection, partitions: int, query: dict = None,
+                  samples_per_partition: int = 10) -> list:
+    """ Sorted _id values splitting collection in partitions, by sampling """
+    if partitions <= 1:
+        return []
+    pipeline = [{'$match': query}] if query else []
+    pipeline += [{'$sample': {'size': partitions * samples_per_partition}},
+                 {'$project': {'_id': 1}},
+                 {'$sort': {'_id': 1}}]
+    ids = [document['_id'] for document in collection.aggregate(pipeline)]
+    if not ids:
+        return []
+    step = len(ids) / partitions
+    boundaries = []
+    for index in range(1, partitions):
+        value = ids[int(index * step)]
+        if not boundaries or boundaries[-1] != value:
+            boundaries.append(value)
+    return boundaries
+
+
+def id_type(value) -> str:
+    """ BSON type alias of an _id value (None if not range partitioned) """
+    for python_type, alias in ID_TYPES:
+        if isinstance(value, python_type):
+            return alias
+    return None
+
+
+def range_filters(boundaries: list) -> list:
+    """
+    _id queries covering all values: (-inf, b0), [b0, b1), ... [bn, +inf)
+    of the boundaries type, and one more for _id values of other types.
+    Boundaries of mixed (or unsupported) types give a single partition
+    """
+    types = {id_type(boundary) for boundary in boundaries}
+    if len(types) != 1 or None in types:
+        return [{}]
+    filters = [{'_id': {'$lt': boundaries[0]}}]
+    for lower, upper in zip(boundaries, boundaries[1:]):
+        filters.append({'_id': {'$gte': lower, '$lt': upper}})
+    filters.append({'_id': {'$gte': boundaries[-1]}})
+    filters.append({'_id': {'$not': {'$type': types.pop()}}})
+    return filters
+
+
+def merge_stage(target, when_matched='replace', when_not_matched='insert') -> dict:
+    """ $merge into target collection name or (database, collection) """
+    if isinstance(target, (tuple, list)):
+        target = {'db': target[0], 'coll': target[1]}
+    return {'$merge': {'into': target, 'on': '_id',
+                       'whenMatched': when_matched,
+                       'whenNotMatched': when_not_matched}}
+
+
+def run_partitioned(db, collection: str, pipeline: list, partitions: int = 1,
+                    query: dict = None, progress=log_progress) -> dict:
+    """
+    Runs pipeline (ending in $merge) once per _id range of collection.
+    Returns {'partitions', 'running_time' (ms)}
+    """
+    source = db[collection]
+    filters = range_filters(id_boundaries(source, partitions, query))
+    t0 = time.time()
+    for index, range_filter in enumerate(filters):
+        match = {'$and': [query, range_filter]} if query and range_filter \
+            else (query or range_filter)
+        stages = ([{'$match': match}] if match else []) + pipeline
+        for _ in source.aggregate(stages, allowDiskUse=True):
+            pass
+        if progress:
+            progress(index + 1, len(filters), time.time() - t0)
+    return {'partitions': len(filters),
+            'running_time': int((time.time() - t0) * 1000)}
+
+
+def copy_collection(db, source: str, target, query: dict = None,
+                    partitions: int = 1, progress=log_progress) -> dict:
+    """ Copies (upserts by _id) documents of source into target """
+    return run_partitioned(db, source, [merge_stage(target)], partitions,
+                           query, progress)
+
+
+def reshape_collection(db, source: str, target, stages: list,
+                       query: dict = None, partitions: int = 1,
+                       replace_target: bool = False,
+                       progress=log_progress) -> dict:
+    """
+    Writes source documents transformed by stages into target.
+    With replace_target (single partition only), target is replaced by $out
+    """
+    if replace_target:
+        if partitions > 1:
+            raise MigrationException(
+                'replace_target requires a single partition')
+        out = target if isinstance(target, str) else \
+            {'db': target[0], 'coll': target[1]}
+        return run_partitioned(db, source, list(stages) + [{'$out': out}],
+                               1, query, progress)
+    return run_partitioned(db, source, list(stages) + [merge_stage(target)],
+                           partitions, query, progress)
+
+
+def backfill_pipeline(collection: str, fields: dict) -> list:
+    """ Pipeline setting fields (aggregation expressions) in place """
+    project = {'_id': 1}
+    project.update(fields)
+    return [{'$project': project},
+            merge_stage(collection, 'merge', 'discard')]
+
+
+def backfill(db, collection: str, fields: dict, query: dict = None,
+             partitions: int = 1, progress=log_progress) -> dict:
+    """
+    Sets fields, computed by aggregation expressions, on documents
+    of collection (MongoDB 4.4+ for $merge into the same collection)
+    """
+    return run_partitioned(db, collection, backfill_pipeline(collection, fields),
+                           partitions, query, progress)
@@ -0,0 +1,161 @@
+import time
+
+import bson
+
+from src.migration_exception import MigrationException
+from src.utils.command_logger import CommandObserver
+from src.utils.logger import get_logger
+
+WRITE_COMMANDS = ['insert', 'update', 'delete', 'findAndModify',
+                  'create', 'createIndexes', 'drop', 'dropIndexes',
+                  'collMod', 'renameCollection', 'aggregate']
+
+IGNORED_COMMANDS = ['hello', 'isMaster', 'ismaster', 'ping', 'getMore',
+                    'killCursors', 'endSessions', 'saslStart', 'saslContinue',
+                    'buildInfo', 'listCollections', 'listIndexes']
+
+SESSION_FIELDS = ['lsid', '$clusterTime', 'txnNumber', '$db',
+                  '$readPreference', 'autocommit', 'startTransaction',
+                  'apiVersion', 'apiStrict', 'apiDeprecationErrors']
+
+BATCH_FIELDS = {'insert': 'documents', 'update': 'updates', 'delete': 'deletes'}
+
+
+class CommandRecorder(CommandObserver):
+    """ Records commands issued against a database """
+
+    def __init__(self, database_name: str, command_names: list = None,
+                 writes_only: bool = False):
+        """
+        :param database_name: str
+        :param command_names: list of recorded commands (None: all but internal)
+        :param writes_only: bool record aggregate only when it writes ($out/$merge),
+            for replay
+        """
+        self.database_name = database_name
+        self.command_names = command_names
+        self.writes_only = writes_only
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        if self.command_names is not None and event.command_name not in self.command_names:
+            return
+        command = clean_command(event.command)
+        if event.command_name == 'renameCollection':
+            if not command['renameCollection'].startswith(self.database_name+'.'):
+                return
+        elif event.database_name != self.database_name:
+            return
+        if event.command_name == 'aggregate' and self.writes_only:
+            stages = command.get('pipeline', [])
+            if not (stages and ('$out' in stages[-1] or '$merge' in stages[-1])):
+                return
+        self.commands.append(command)
+
+
+def clean_command(command) -> dict:
+    """ Copy of command without session fields """
+    return {key: value for key, value in command.items()
+            if key not in SESSION_FIELDS}
+
+
+class CommandLog:
+    """ Recorded write commands of a deterministic migration """
+
+    LOG = get_logger()
+    MAX_BATCH_SIZE = 1000
+    MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, name: str, description: str = None,
+                 dependencies: list = None, checksum: str = None,
+                 database_name: str = None, commands: list = None):
+        self.name = name
+        self.description = description
+        self.dependencies = dependencies or []
+        self.checksum = checksum
+        self.database_name = database_name
+        self.commands = commands or []
+
+    def compact(self):
+        """
+        Merges consecutive insert/update/delete commands on the same
+        collection with the same options into batched commands
+        """
+        commands = []
+        batch_bytes = 0
+        for command in self.commands:
+            command_name = next(iter(command))
+            field = BATCH_FIELDS.get(command_name)
+            previous = commands[-1] if commands else None
+            if field and previous and self._same_batch(previous, command, field):
+                items = command[field]
+                items_bytes = sum(len(bson.encode(item)) for item in items)
+                if len(previous[field]) + len(items) <= self.MAX_BATCH_SIZE and \
+                        batch_bytes + items_bytes <= self.MAX_BATCH_BYTES:
+                    previous[field] = list(previous[field]) + list(items)
+                    batch_bytes += items_bytes
+                    continue
+            if field:
+                command = dict(command)
+                command[field] = list(command[field])
+                batch_bytes = sum(len(bson.encode(item))
+                                  for item in command[field])
+            commands.append(command)
+
+        self.LOG.info('COMMAND LOG %s COMPACTED: %s -> %s commands',
+                      self.name, len(self.commands), len(commands))
+        self.commands = commands
+        return self
+
+    def _same_batch(self, previous: dict, command: dict, field: str) -> bool:
+        return next(iter(previous)) == next(iter(command)) and \
+            {k: v for k, v in previous.items() if k != field} == \
+            {k: v for k, v in command.items() if k != field}
+
+    def save(self, filename: str):
+        with open(filename, 'wb') as f:
+            f.write(bson.encode({'name': self.name,
+                                 'description': self.description,
+                                 'dependencies': self.dependencies,
+                                 'checksum': self.checksum,
+                                 'database_name': self.database_name,
+                                 'count': len(self.commands)}))
+            for command in self.commands:
+                f.write(bson.encode(command))
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, 'rb') as f:
+            documents = bson.decode_all(f.read())
+        if not documents or 'name' not in documents[0] or \
+                documents[0].get('count') != len(documents) - 1:
+            raise MigrationException(
+                'Invalid command log {0}'.format(filename))
+        header = documents[0]
+        return cls(header['name'], header.get('description'),
+                   header.get('dependencies'), header.get('checksum'),
+                   header.get('database_name'), documents[1:])
+
+    def replay(self, db) -> int:
+        """ Runs commands against db, returns running time in ms """
+        t0 = time.time()
+        for command in self.commands:
+            command_name = next(iter(command))
+            if command_name == 'renameCollection':
+                command = self._rename_namespaces(command, db.name)
+                reply = db.client.admin.command(command)
+            else:
+                reply = db.command(command)
+            if reply.get('writeErrors'):
+                raise MigrationException('Replay of {0} failed on {1}: {2}'.format(
+                    self.name, command_name, reply['writeErrors'][0]))
+        return int((time.time() - t0) * 1000)
+
+    def _rename_namespaces(self, command: dict, database_name: str) -> dict:
+        command = dict(command)
+        for key in ['renameCollection', 'to']:
+            _, _, collection = command[key].partition('.')
+            command[key] = database_name + '.' + collection
+        return command
@@ -0,0 +1,170 @@
+import datetime
+import json
+import os
+import time
+
+from src.utils.command_logger import CommandCounter, CommandLogger, CommandObserver
+
+STATUSES = ['successful', 'unsuccessful', 'previously_applied', 'not_applied',
+            'deferred', 'not_run']
+
+PROMETHEUS_PREFIX = 'canaa_migration'
+
+
+class StateCommands(CommandObserver):
+    """ Sums durations of commands on the migrations state collection """
+
+    def __init__(self, database_name: str, collection_name: str):
+        self.database_name = database_name
+        self.collection_name = collection_name
+        self.commands = 0
+        self.duration_micros = 0
+        self.__started = set()
+
+    def started(self, event):
+        if event.database_name == self.database_name and \
+                event.command.get(event.command_name) == self.collection_name:
+            self.__started.add(event.request_id)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        if event.request_id in self.__started:
+            self.__started.discard(event.request_id)
+            self.commands += 1
+            self.duration_micros += event.duration_micros
+
+
+class RunReport:
+    """
+    Structured report of an upgrade or downgrade run: status, timing and
+    MongoDB commands of each migration, and totals of the run, including
+    time spent in state collection commands versus migration bodies.
+    While active (with statement), counts commands on the state collection
+    """
+
+    def __init__(self, operation: str, database_name: str, state_collection: str):
+        self.operation = operation
+        self.database_name = database_name
+        self.state_collection = state_collection
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.finished = None
+        self.migrations = []
+        self.__t0 = time.time()
+        self.__running_time = None
+        self.__state_commands = StateCommands(database_name, state_collection)
+
+    def add(self, name: str, status: str, running_time: int = None,
+            counter: CommandCounter = None) -> dict:
+        entry = {'name': name,
+                 'status': status,
+                 'running_time': running_time,
+                 'commands': counter.commands if counter else None,
+                 'command_time': counter.duration_micros // 1000 if counter else None,
+                 'failures': counter.failures if counter else None,
+                 'documents': counter.documents if counter else None}
+        self.migrations.append(entry)
+        return entry
+
+    def add_names(self, names, status: str):
+        for name in names:
+            self.add(name, status)
+
+    @property
+    def running_time(self) -> int:
+        if self.__running_time is not None:
+            return self.__running_time
+        return int((time.time() - self.__t0) * 1000)
+
+    def totals(self) -> dict:
+        ran = [entry for entry in self.migrations if entry['running_time'] is not None]
+        counts = {status: 0 for status in STATUSES}
+        for entry in self.migrations:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return {'migrations': counts,
+                'running_time': self.running_time,
+                'migration_time': sum(entry['running_time'] for entry in ran),
+                'commands': sum(entry['commands'] or 0 for entry in ran),
+                'command_time': sum(entry['command_time'] or 0 for entry in ran),
+                'documents': sum(entry['documents'] or 0 for entry in ran),
+                'state_commands': self.__state_commands.commands,
+                'state_io_time': self.__state_commands.duration_micros // 1000}
+
+    def to_dict(self) -> dict:
+        return {'operation': self.operation,
+                'database': self.database_name,
+                'started': self.started.isoformat(),
+                'finished': self.finished.isoformat() if self.finished else None,
+                'migrations': self.migrations,
+                'totals': self.totals()}
+
+    def to_prometheus(self) -> str:
+        """ Prometheus text exposition format (for node exporter textfile collector) """
+        totals = self.totals()
+        labels = {'operation': self.operation, 'database': self.database_name}
+        lines = []
+
+        def metric(name: str, help_text: str, samples: list):
+            lines.append('# HELP {0}_{1} {2}'.format(PROMETHEUS_PREFIX, name, help_text))
+            lines.append('# TYPE {0}_{1} gauge'.format(PROMETHEUS_PREFIX, name))
+            for sample_labels, value in samples:
+                lines.append('{0}_{1}{{{2}}} {3}'.format(
+                    PROMETHEUS_PREFIX, name, _prometheus_labels(sample_labels), value))
+
+        metric('run_timestamp_seconds', 'Start of the last run',
+               [(labels, self.started.timestamp())])
+        metric('run_duration_seconds', 'Duration of the last run',
+               [(labels, totals['running_time'] / 1000)])
+        metric('run_migrations', 'Migrations of the last run by status',
+               [(dict(labels, status=status), count)
+                for status, count in totals['migrations'].items()])
+        metric('run_body_seconds', 'Time spent in migration bodies',
+               [(labels, totals['migration_time'] / 1000)])
+        metric('run_state_io_seconds', 'Time spent in state collection commands',
+               [(labels, totals['state_io_time'] / 1000)])
+        metric('run_commands', 'MongoDB commands of migrations',
+               [(labels, totals['commands'])])
+        metric('run_command_seconds', 'Duration of MongoDB commands of migrations',
+               [(labels, totals['command_time'] / 1000)])
+
+        ran = [entry for entry in self.migrations if entry['running_time'] is not None]
+        for name, key, help_text, scale in [
+                ('duration_seconds', 'running_time', 'Running time of migration', 1000),
+                ('commands', 'commands', 'MongoDB commands of migration', 1),
+                ('command_seconds', 'command_time', 'Duration of MongoDB commands of migration', 1000),
+                ('documents', 'documents', 'Documents affected by migration', 1)]:
+            metric(name, help_text,
+                   [(dict(labels, migration=entry['name'], status=entry['status']),
+                     entry[key] / scale if scale > 1 else entry[key])
+                    for entry in ran if entry[key] is not None])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, filename: str):
+        """ Writes report as Prometheus textfile (.prom) or JSON, atomically """
+        if filename.endswith('.prom'):
+            data = self.to_prometheus()
+        else:
+            data = json.dumps(self.to_dict(), indent=2, default=str)
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+
+    def __enter__(self):
+        CommandLogger.subscribe(self.__state_commands)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        CommandLogger.unsubscribe(self.__state_commands)
+        self.finished = datetime.datetime.now(datetime.timezone.utc)
+        self.__running_time = int((time.time() - self.__t0) * 1000)
+
+
+def _prometheus_labels(labels: dict) -> str:
+    return ','.join('{0}="{1}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items())
@@ -9,22 +9,38 @@ from src.migration_setup import MigrationSetup
 
 class MigrationStateData:
 
+    __slots__ = ['name', 'applied', 'description', 'running_time', 'checksum',
+                 'estimated_time', 'verification', 'upgrade_time']
+
     def __init__(self, from_data=None):
         self.name: str = None
         self.applied: datetime.datetime = None
         self.description: str = None
         self.running_time: int = 0
+        self.checksum: str = None
+        self.estimated_time: int = None
+        self.verification: dict = None
+        # Duration of last upgrade (running_time is also set by downgrade)
+        self.upgrade_time: int = None
         if isinstance(from_data, dict):
             self.name = from_data.get('_id', None)
             self.applied = from_data.get('applied', None)
             self.description = from_data.get('description', None)
             self.running_time = from_data.get('running_time', 0)
+            self.checksum = from_data.get('checksum', None)
+            self.estimated_time = from_data.get('estimated_time', None)
+            self.verification = from_data.get('verification', None)
+            self.upgrade_time = from_data.get('upgrade_time', None)
 
     def to_dict(self):
         return {"_id": self.name,
                 "applied": self.applied,
                 "description": self.description,
-                "running_time": self.running_time}
+                "running_time": self.running_time,
+                "checksum": self.checksum,
+                "estimated_time": self.estimated_time,
+                "verification": self.verification,
+                "upgrade_time": self.upgrade_time}
 
     def __str__(self):
         return "{0:20} - {1:20} - {2}".format(
@@ -42,13 +58,31 @@ class MigrationState:
         self.__setup = setup
 
     def read_states(self, names: list) -> list:
-        m_states = self.__setup.collection.find({"_id": {'$in': names}})
+        return list(self.iter_states(names))
+
+    def iter_states(self, names: list = None, applied: bool = None,
+                    projection: list = None):
+        """
+        Streams states from database
+        :param names: list of migrations names (None for all)
+        :param applied: bool filter applied (True) or not applied (False) states
+        :param projection: list of fields to read (None for all)
+        """
+        query = {}
+        if names is not None:
+            query['_id'] = {'$in': names}
+        if applied is True:
+            query['applied'] = {'$ne': None}
+        elif applied is False:
+            query['applied'] = None
 
-        states = []
-        for state in m_states:
-            msd = MigrationStateData(state)
-            states.append(msd)
-        return states
+        for state in self.__setup.collection.find(query, projection):
+            yield MigrationStateData(state)
+
+    def read_all_states(self) -> list:
+        """ Reads all states of migrations collection in one query """
+        return [MigrationStateData(state)
+                for state in self.__setup.collection.find({})]
 
     def read_state(self, migration_name: str) -> MigrationStateData:
         data = self.__setup.collection.find_one({"_id": migration_name})
@@ -56,9 +90,18 @@ class MigrationState:
             return MigrationStateData(data)
         return MigrationStateData({"_id": migration_name})
 
-    def write_state(self, msd: MigrationStateData):
+    def write_estimate(self, migration_name: str, estimated_time: int):
+        """ Sets estimated_time, keeping other fields (of a not yet written state) """
+        self.__setup.collection.update_one(
+            {"_id": migration_name},
+            {"$set": {"estimated_time": estimated_time}},
+            upsert=True
+        )
+
+    def write_state(self, msd: MigrationStateData, session=None):
         self.__setup.collection.replace_one(
             {"_id": msd.name},
             msd.to_dict(),
-            upsert=True
+            upsert=True,
+            session=session
         )
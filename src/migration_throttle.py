@@ -0,0 +1,228 @@
+import collections
+import threading
+import time
+
+from pymongo.collection import Collection
+from pymongo.results import BulkWriteResult, InsertManyResult
+
+from src.utils.command_logger import CommandLogger, CommandObserver
+from src.utils.logger import get_logger
+
+
+class LatencyWindow(CommandObserver):
+    """ Sliding window of command durations (duration_micros) """
+
+    def __init__(self, size: int = 1000):
+        self.__durations = collections.deque(maxlen=size)
+        self.__lock = threading.Lock()
+
+    def succeeded(self, event):
+        with self.__lock:
+            self.__durations.append(event.duration_micros)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+    def __len__(self):
+        return len(self.__durations)
+
+    def percentile(self, percent: float = 99) -> int:
+        """ Returns percentile of durations in microseconds, None if empty """
+        with self.__lock:
+            durations = sorted(self.__durations)
+        if not durations:
+            return None
+        index = min(len(durations) - 1, int(len(durations) * percent / 100))
+        return durations[index]
+
+    def clear(self):
+        with self.__lock:
+            self.__durations.clear()
+
+
+class AdaptiveThrottle:
+    """
+    Caps write operations per second and adapts rate and batch size
+    to observed p99 command latency: halves both when p99 is above
+    target and grows them when p99 is below half the target
+    """
+
+    LOG = get_logger()
+    MIN_SAMPLES = 10
+
+    def __init__(self, max_ops_per_second: int = 1000,
+                 target_p99_micros: int = 50000,
+                 batch_size: int = 100,
+                 min_batch_size: int = 10,
+                 max_batch_size: int = 1000,
+                 window: LatencyWindow = None):
+        self.__max_rate = float(max_ops_per_second)
+        self.__min_rate = max(1.0, self.__max_rate / 100)
+        self.__rate = self.__max_rate
+        self.__target = target_p99_micros
+        self.__batch_size = batch_size
+        self.__min_batch_size = min_batch_size
+        self.__max_batch_size = max_batch_size
+        self.__window = window or LatencyWindow()
+        self.__next_time = 0.0
+        self.__lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    @property
+    def batch_size(self) -> int:
+        return self.__batch_size
+
+    @property
+    def window(self) -> LatencyWindow:
+        return self.__window
+
+    def acquire(self, ops: int = 1):
+        """ Waits until ops operations can be issued within the rate """
+        with self.__lock:
+            now = time.monotonic()
+            start = max(now, self.__next_time)
+            self.__next_time = start + ops / self.__rate
+        if start > now:
+            time.sleep(start - now)
+
+    def adjust(self):
+        if len(self.__window) < self.MIN_SAMPLES:
+            return
+        p99 = self.__window.percentile(99)
+        if p99 > self.__target:
+            self.__rate = max(self.__min_rate, self.__rate / 2)
+            self.__batch_size = max(self.__min_batch_size,
+                                    self.__batch_size // 2)
+            self.__window.clear()
+            self.LOG.info('THROTTLE BACKOFF: p99 %sus, %s ops/s, batch %s',
+                          p99, int(self.__rate), self.__batch_size)
+        elif p99 < self.__target / 2:
+            self.__rate = min(self.__max_rate, self.__rate * 1.25)
+            self.__batch_size = min(self.__max_batch_size,
+                                    self.__batch_size + self.__min_batch_size)
+
+    def batches(self, iterable):
+        """ Yields lists of items sized and paced by the throttle """
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= self.__batch_size:
+                self.adjust()
+                self.acquire(len(batch))
+                yield batch
+                batch = []
+        if batch:
+            self.adjust()
+            self.acquire(len(batch))
+            yield batch
+
+    def __enter__(self):
+        CommandLogger.subscribe(self.__window)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        CommandLogger.unsubscribe(self.__window)
+
+
+class ThrottledCollection:
+    """
+    Collection proxy that paces write operations through a throttle.
+    insert_many and bulk_write are split into chunks of the throttle
+    batch_size, each one paced. Other writes (including update_many and
+    delete_many) are paced as one operation: batch their filters by
+    db.throttle.batches to limit documents per command
+    """
+
+    WRITE_METHODS = ['insert_one', 'insert_many', 'replace_one',
+                     'update_one', 'update_many', 'delete_one', 'delete_many',
+                     'find_one_and_update', 'find_one_and_replace',
+                     'find_one_and_delete', 'bulk_write']
+    CHUNKED_METHODS = {'insert_many': 'documents', 'bulk_write': 'requests'}
+
+    def __init__(self, collection: Collection, throttle: AdaptiveThrottle):
+        self.__collection = collection
+        self.__throttle = throttle
+
+    def __getattr__(self, name):
+        attr = getattr(self.__collection, name)
+        if isinstance(attr, Collection):
+            return ThrottledCollection(attr, self.__throttle)
+        if name not in self.WRITE_METHODS:
+            return attr
+
+        def throttled(*args, **kwargs):
+            if name in self.CHUNKED_METHODS:
+                return self._chunked(name, attr, args, kwargs)
+            self.__throttle.adjust()
+            self.__throttle.acquire()
+            return attr(*args, **kwargs)
+        return throttled
+
+    def _chunked(self, name: str, method, args: tuple, kwargs: dict):
+        """ Calls method once per throttle batch of its documents (requests) """
+        field = self.CHUNKED_METHODS[name]
+        if args:
+            items, args = args[0], args[1:]
+        else:
+            items = kwargs.pop(field)
+        results = []
+        sizes = []
+        for chunk in self.__throttle.batches(items):
+            results.append(method(chunk, *args, **kwargs))
+            sizes.append(len(chunk))
+        if not results:
+            # Empty input: let pymongo raise (or return) as usual
+            return method([], *args, **kwargs)
+        if name == 'insert_many':
+            return InsertManyResult(
+                [inserted_id for result in results for inserted_id in result.inserted_ids],
+                results[0].acknowledged)
+        return merge_bulk_results(results, sizes)
+
+    def __getitem__(self, name):
+        return ThrottledCollection(self.__collection[name], self.__throttle)
+
+
+def merge_bulk_results(results: list, sizes: list) -> BulkWriteResult:
+    """ One BulkWriteResult of consecutive chunks (of sizes) of a bulk_write """
+    merged = {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0,
+              'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0,
+              'upserted': []}
+    offset = 0
+    for result, size in zip(results, sizes):
+        if result.acknowledged:
+            data = result.bulk_api_result
+            for key in ['nInserted', 'nUpserted', 'nMatched', 'nModified', 'nRemoved']:
+                merged[key] += data.get(key, 0)
+            merged['upserted'].extend(dict(upserted, index=upserted['index'] + offset)
+                                      for upserted in data.get('upserted', []))
+        offset += size
+    return BulkWriteResult(merged, results[0].acknowledged)
+
+
+class ThrottledDatabase:
+    """ Database proxy whose collections are throttled """
+
+    def __init__(self, db, throttle: AdaptiveThrottle):
+        self.__db = db
+        self.__throttle = throttle
+
+    @property
+    def throttle(self) -> AdaptiveThrottle:
+        return self.__throttle
+
+    def get_collection(self, name, *args, **kwargs):
+        return ThrottledCollection(self.__db.get_collection(name, *args, **kwargs),
+                                   self.__throttle)
+
+    def __getattr__(self, name):
+        attr = getattr(self.__db, name)
+        if isinstance(attr, Collection):
+            return ThrottledCollection(attr, self.__throttle)
+        return attr
+
+    def __getitem__(self, name):
+        return ThrottledCollection(self.__db[name], self.__throttle)
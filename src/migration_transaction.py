@@ -0,0 +1,77 @@
+import inspect
+
+from pymongo.collection import Collection
+from pymongo.client_session import ClientSession
+
+_SESSION_METHODS = {}
+
+
+def _accepts_session(method) -> bool:
+    try:
+        return 'session' in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _bind_session(target, name: str, attr, session: ClientSession):
+    """ attr (target.name) with session argument, if it accepts one """
+    if not callable(attr):
+        return attr
+    key = (type(target), name)
+    if key not in _SESSION_METHODS:
+        _SESSION_METHODS[key] = _accepts_session(attr)
+    if not _SESSION_METHODS[key]:
+        return attr
+
+    def in_session(*args, **kwargs):
+        kwargs.setdefault('session', session)
+        result = attr(*args, **kwargs)
+        if isinstance(result, Collection):
+            return SessionCollection(result, session)
+        return result
+    return in_session
+
+
+class SessionCollection:
+    """ Collection proxy that runs operations in a client session (and its transaction) """
+
+    def __init__(self, collection: Collection, session: ClientSession):
+        self.__collection = collection
+        self.__session = session
+
+    def __getattr__(self, name):
+        attr = getattr(self.__collection, name)
+        if isinstance(attr, Collection):
+            return SessionCollection(attr, self.__session)
+        return _bind_session(self.__collection, name, attr, self.__session)
+
+    def __getitem__(self, name):
+        return SessionCollection(self.__collection[name], self.__session)
+
+
+class SessionDatabase:
+    """
+    Database proxy whose collections and methods (command, aggregate,
+    create_collection, drop_collection...) run in a client session
+    """
+
+    def __init__(self, db, session: ClientSession):
+        self.__db = db
+        self.__session = session
+
+    @property
+    def session(self) -> ClientSession:
+        return self.__session
+
+    def get_collection(self, name, *args, **kwargs):
+        return SessionCollection(self.__db.get_collection(name, *args, **kwargs),
+                                 self.__session)
+
+    def __getattr__(self, name):
+        attr = getattr(self.__db, name)
+        if isinstance(attr, Collection):
+            return SessionCollection(attr, self.__session)
+        return _bind_session(self.__db, name, attr, self.__session)
+
+    def __getitem__(self, name):
+        return SessionCollection(self.__db[name], self.__session)
@@ -0,0 +1,135 @@
+"""
+Post-migration verification of collections.
+
+A migration module may declare a verify hook, called after a successful
+upgrade, whose result is stored in the migration state:
+
+    from src.migration_verifier import verify_collection
+
+    def verify(db) -> dict:
+        return verify_collection(db, 'numbers_collection',
+                                 expected_count=1000, required_fields=['i'])
+"""
+import concurrent.futures
+import decimal
+import hashlib
+import time
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import OperationFailure
+
+from src.migration_pipelines import id_boundaries, range_filters
+from src.utils.logger import get_logger
+
+LOG = get_logger()
+
+HASH_MODULUS = 2 ** 64
+
+
+def partition_pipeline(range_filter: dict, fields: list) -> list:
+    """ Count, field coverage and hash sum of a partition, server side (MongoDB 7+) """
+    group = {'_id': None,
+             'count': {'$sum': 1},
+             'hash': {'$sum': {'$toDecimal': {'$toHashedIndexKey': '$$ROOT'}}}}
+    for index, field in enumerate(fields):
+        group['f{0}'.format(index)] = {'$sum': {'$cond': [
+            {'$eq': [{'$type': '$'+field}, 'missing']}, 0, 1]}}
+    return [{'$match': range_filter}, {'$group': group}]
+
+
+def _server_partition(collection, range_filter: dict, fields: list) -> dict:
+    result = next(collection.aggregate(
+        partition_pipeline(range_filter, fields), allowDiskUse=True), None) or {}
+    hash_value = result.get('hash', 0)
+    if isinstance(hash_value, bson.Decimal128):
+        hash_value = hash_value.to_decimal()
+    return {'count': result.get('count', 0),
+            'fields': [result.get('f{0}'.format(index), 0)
+                       for index in range(len(fields))],
+            'hash': str(hash_value)}
+
+
+def _client_partition(collection, range_filter: dict, fields: list) -> dict:
+    """ Fallback: hashes raw documents in the client """
+    raw = collection.with_options(
+        codec_options=collection.codec_options.with_options(
+            document_class=RawBSONDocument))
+    count = 0
+    coverage = [0] * len(fields)
+    hash_value = 0
+    for document in raw.find(range_filter):
+        count += 1
+        digest = hashlib.sha1(document.raw).digest()
+        hash_value = (hash_value + int.from_bytes(digest[:8], 'big')) % HASH_MODULUS
+        if fields:
+            decoded = bson.decode(document.raw)
+            for index, field in enumerate(fields):
+                if _has_field(decoded, field):
+                    coverage[index] += 1
+    return {'count': count, 'fields': coverage, 'hash': str(hash_value)}
+
+
+def _has_field(document: dict, field: str) -> bool:
+    value = document
+    for key in field.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return False
+        value = value[key]
+    return True
+
+
+def verify_collection(db, collection: str, expected_count: int = None,
+                      required_fields: list = None, expected_hash: str = None,
+                      partitions: int = 8, workers: int = 4,
+                      server_side: bool = True) -> dict:
+    """
+    Hashes _id range partitions of collection in parallel.
+    Returns {'ok', 'collection', 'count', 'fields', 'hash', 'method',
+    'partitions', 'running_time'}. Hash is order independent, but it depends
+    on the method (server or client side), so compare hashes of the same method
+    """
+    t0 = time.time()
+    fields = list(required_fields or [])
+    source = db[collection]
+    filters = range_filters(id_boundaries(source, partitions))
+
+    method = 'server' if server_side else 'client'
+    results = None
+    if server_side:
+        try:
+            results = _run_partitions(_server_partition, source, filters, fields, workers)
+        except OperationFailure as exc:
+            LOG.warning('SERVER SIDE HASH UNAVAILABLE (%s), HASHING IN CLIENT', exc)
+            method = 'client'
+    if results is None:
+        results = _run_partitions(_client_partition, source, filters, fields, workers)
+
+    count = sum(result['count'] for result in results)
+    coverage = {field: sum(result['fields'][index] for result in results)
+                for index, field in enumerate(fields)}
+    if method == 'server':
+        hash_value = str(sum(decimal.Decimal(result['hash']) for result in results))
+    else:
+        hash_value = str(sum(int(result['hash']) for result in results) % HASH_MODULUS)
+
+    ok = (expected_count is None or count == expected_count) and \
+        all(covered == count for covered in coverage.values()) and \
+        (expected_hash is None or expected_hash == hash_value)
+    verification = {'ok': ok,
+                    'collection': collection,
+                    'count': count,
+                    'fields': coverage,
+                    'hash': hash_value,
+                    'method': method,
+                    'partitions': len(results),
+                    'running_time': int((time.time() - t0) * 1000)}
+    LOG.info('VERIFY COLLECTION %s', verification)
+    return verification
+
+
+def _run_partitions(function, collection, filters: list, fields: list,
+                    workers: int) -> list:
+    with concurrent.futures.ThreadPoolExecutor(max(1, workers)) as executor:
+        return list(executor.map(lambda range_filter: function(collection, range_filter, fields),
+                                 filters))
@@ -0,0 +1,113 @@
+import datetime
+
+import pymongo
+
+from src.migration_exception import MigrationException
+from src.utils.command_logger import CommandLogger
+from src.utils.logger import get_logger
+
+
+class ScratchDatabase:
+    """
+    Temporary database with sampled copies of source collections
+    (documents and indexes), dropped on exit.
+    It's created on the scratch_uri server (e.g. a local mongod), or on the
+    source server if not given. Databases not created by ScratchDatabase
+    (without its marker collection) are never dropped
+    """
+
+    LOG = get_logger()
+    SUFFIX = '_canaa_scratch'
+    MARKER_COLLECTION = 'canaa_scratch'
+    INDEX_IGNORED_OPTIONS = ['v', 'ns', 'key']
+
+    def __init__(self, source_db, collections: list, sample_size: int = 1000,
+                 scratch_uri: str = None):
+        """
+        :param source_db: pymongo Database
+        :param collections: list of collection names to copy
+        :param sample_size: int max documents sampled per collection
+        :param scratch_uri: str MongoDB URI of scratch server (default: source server)
+        """
+        self.__source = source_db
+        self.__collections = collections
+        self.__sample_size = sample_size
+        self.__scratch_uri = scratch_uri
+        self.__client = pymongo.MongoClient(
+            scratch_uri, event_listeners=[CommandLogger()]) if scratch_uri \
+            else source_db.client
+        self.__db = self.__client.get_database(source_db.name + self.SUFFIX)
+        self.__created = False
+        self.__samples = {}
+
+    @property
+    def uri(self) -> str:
+        """ Scratch server URI (None: source server) """
+        return self.__scratch_uri
+
+    @property
+    def db(self):
+        return self.__db
+
+    @property
+    def samples(self) -> dict:
+        """ {collection: (sampled documents, total documents)} """
+        return self.__samples
+
+    @property
+    def sampled_documents(self) -> int:
+        return sum(sampled for sampled, _ in self.__samples.values())
+
+    @property
+    def total_documents(self) -> int:
+        return sum(total for _, total in self.__samples.values())
+
+    def create(self):
+        if self.__db.name in self.__client.list_database_names():
+            if self.MARKER_COLLECTION not in self.__db.list_collection_names():
+                raise MigrationException(
+                    'Database {0} exists and was not created as scratch database'.format(
+                        self.__db.name))
+            # Left by an interrupted run
+            self.__client.drop_database(self.__db.name)
+        self.__db[self.MARKER_COLLECTION].insert_one(
+            {'source': self.__source.name, 'created': datetime.datetime.now()})
+        self.__created = True
+        for name in self.__collections:
+            self.__samples[name] = self._copy_sample(name)
+        self.LOG.info('SCRATCH DATABASE %s: %s', self.__db.name, self.__samples)
+        return self
+
+    def drop(self):
+        if self.__created:
+            self.__client.drop_database(self.__db.name)
+            self.__created = False
+        if self.__scratch_uri:
+            self.__client.close()
+
+    def _copy_sample(self, name: str):
+        source = self.__source[name]
+        target = self.__db[name]
+        for index in source.list_indexes():
+            if index['name'] == '_id_':
+                continue
+            options = {key: value for key, value in index.items()
+                       if key not in self.INDEX_IGNORED_OPTIONS}
+            target.create_index(list(index['key'].items()), **options)
+
+        total = source.estimated_document_count()
+        documents = list(source.aggregate(
+            [{'$sample': {'size': self.__sample_size}}]))
+        if documents:
+            target.insert_many(documents)
+        return len(documents), total
+
+    def __enter__(self):
+        try:
+            return self.create()
+        except Exception:
+            self.drop()
+            raise
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.drop()
@@ -0,0 +1,67 @@
+import asyncio
+import inspect
+
+from src.migration_exception import MigrationException
+
+from .command_logger import CommandLogger
+
+
+def async_client(mongodb_uri: str):
+    """ pymongo AsyncMongoClient (pymongo 4.9+) or, if not available, motor client """
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError:
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+        except ImportError:
+            raise MigrationException(
+                'Async migrations require pymongo 4.9+ or motor')
+    return AsyncMongoClient(mongodb_uri, event_listeners=[CommandLogger()])
+
+
+async def close_client(client):
+    result = client.close()
+    if inspect.isawaitable(result):
+        await result
+
+
+def run_async(method, mongodb_uri: str, database_name: str = None):
+    """
+    Runs async method(db) to completion, on its own event loop and client
+    (db is database_name, default: database of mongodb_uri)
+    """
+    async def run():
+        client = async_client(mongodb_uri)
+        try:
+            db = client.get_database(database_name) if database_name \
+                else client.get_default_database()
+            return await method(db)
+        finally:
+            await close_client(client)
+    return asyncio.run(run())
+
+
+def run_upgrade(migration, db, mongodb_uri: str):
+    """
+    Runs migration upgrade on db. Async upgrades run on an async client
+    of the same database
+    """
+    if migration.async_upgrade:
+        return run_async(migration.upgrade, mongodb_uri, db.name)
+    return migration.upgrade(db)
+
+
+def run_downgrade(migration, db, mongodb_uri: str):
+    if migration.async_downgrade:
+        return run_async(migration.downgrade, mongodb_uri, db.name)
+    return migration.downgrade(db)
+
+
+async def gather_limited(awaitables, limit: int = 8) -> list:
+    """ Awaits awaitables (e.g. batches of writes) with at most limit in flight """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
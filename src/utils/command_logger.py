@@ -3,23 +3,126 @@ import pymongo
 from .logger import get_logger
 
 
+class CommandObserver:
+    """ Receives command events forwarded by CommandLogger """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def __enter__(self):
+        CommandLogger.subscribe(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        CommandLogger.unsubscribe(self)
+
+
 class CommandLogger(pymongo.monitoring.CommandListener):
     ENABLED = True
+    OBSERVERS = []
 
     def __init__(self):
         self.log = get_logger()
 
+    @classmethod
+    def subscribe(cls, observer: CommandObserver):
+        cls.OBSERVERS.append(observer)
+
+    @classmethod
+    def unsubscribe(cls, observer: CommandObserver):
+        if observer in cls.OBSERVERS:
+            cls.OBSERVERS.remove(observer)
+
     def started(self, event):
         if self.ENABLED:
             self.log.info('STARTED: %s#%s : %s', event.command_name,
                           event.request_id, event.command)
+        for observer in tuple(self.OBSERVERS):
+            observer.started(event)
 
     def succeeded(self, event):
         if self.ENABLED:
             self.log.info('SUCCEDED: %s#%s : %sus', event.command_name,
                           event.request_id, event.duration_micros)
+        for observer in tuple(self.OBSERVERS):
+            observer.succeeded(event)
 
     def failed(self, event):
         if self.ENABLED:
-            self.log.error('FAILED: %s%%s : %sus', event.command_name,
+            self.log.error('FAILED: %s#%s : %sus', event.command_name,
                            event.request_id, event.duration_micros)
+        for observer in tuple(self.OBSERVERS):
+            observer.failed(event)
+
+
+class CommandCounter(CommandObserver):
+    """ Counts commands, their durations and affected documents """
+
+    WRITE_COMMANDS = ['insert', 'update', 'delete']
+    COUNTS = ['commands', 'failures', 'duration_micros', 'documents']
+
+    def __init__(self, database_name: str = None, exclude_collection: str = None):
+        """
+        :param database_name: str count only commands of this database
+        :param exclude_collection: str don't count commands on this collection
+            (e.g. migrations state reads and writes)
+        """
+        self.database_name = database_name
+        self.exclude_collection = exclude_collection
+        self.commands = 0
+        self.failures = 0
+        self.duration_micros = 0
+        self.documents = 0
+        self.__excluded = set()
+
+    def _accept(self, event) -> bool:
+        if event.request_id in self.__excluded:
+            self.__excluded.discard(event.request_id)
+            return False
+        return not self.database_name or event.database_name == self.database_name
+
+    def started(self, event):
+        if self.exclude_collection and \
+                event.command.get(event.command_name) == self.exclude_collection:
+            self.__excluded.add(event.request_id)
+
+    def snapshot(self) -> 'CommandCounter':
+        """ Copy of current counts """
+        return self.split(1)[0]
+
+    def since(self, snapshot: 'CommandCounter') -> 'CommandCounter':
+        """ Counts after snapshot """
+        counter = CommandCounter(self.database_name, self.exclude_collection)
+        for field in self.COUNTS:
+            setattr(counter, field, getattr(self, field) - getattr(snapshot, field))
+        return counter
+
+    def split(self, parts: int) -> list:
+        """ Counts divided among parts (remainders to the first one) """
+        counters = []
+        for index in range(parts):
+            counter = CommandCounter(self.database_name, self.exclude_collection)
+            for field in self.COUNTS:
+                total = getattr(self, field)
+                setattr(counter, field, total // parts + (total % parts if index == 0 else 0))
+            counters.append(counter)
+        return counters
+
+    def succeeded(self, event):
+        if self._accept(event):
+            self.commands += 1
+            self.duration_micros += event.duration_micros
+            if event.command_name in self.WRITE_COMMANDS:
+                self.documents += event.reply.get('n', 0)
+
+    def failed(self, event):
+        if self._accept(event):
+            self.commands += 1
+            self.failures += 1
+            self.duration_micros += event.duration_micros
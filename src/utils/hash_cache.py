@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+from .logger import get_logger
+
+
+def file_hash(filename: str) -> str:
+    """ SHA-256 hex digest of file contents """
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class FileHashCache:
+    """
+    Content hashes of files, cached by modification time and size.
+    Files with unchanged mtime and size are never re-read.
+    """
+
+    LOG = get_logger()
+
+    def __init__(self, cache_file: str = None):
+        """
+        :param cache_file: str JSON file to persist the cache (optional)
+        """
+        self.__cache_file = cache_file
+        self.__entries = {}
+        self.__dirty = False
+        self._load()
+
+    def hash(self, filename: str) -> str:
+        stat = os.stat(filename)
+        key = os.path.abspath(filename)
+        entry = self.__entries.get(key)
+        if entry and entry['mtime'] == stat.st_mtime_ns and \
+                entry['size'] == stat.st_size:
+            return entry['hash']
+
+        digest = file_hash(filename)
+        self.__entries[key] = {'mtime': stat.st_mtime_ns,
+                               'size': stat.st_size,
+                               'hash': digest}
+        self.__dirty = True
+        return digest
+
+    def save(self) -> bool:
+        """ Persists cache, if changed. Returns False on write errors """
+        if not (self.__cache_file and self.__dirty):
+            return True
+        try:
+            with open(self.__cache_file, 'w') as f:
+                json.dump(self.__entries, f)
+            self.__dirty = False
+            return True
+        except Exception as exc:
+            self.LOG.debug('HASH CACHE NOT SAVED IN %s: %s',
+                           self.__cache_file, str(exc))
+            return False
+
+    def _load(self):
+        if not (self.__cache_file and os.path.isfile(self.__cache_file)):
+            return
+        try:
+            with open(self.__cache_file) as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.__entries = entries
+        except Exception as exc:
+            self.LOG.warning('INVALID HASH CACHE %s: %s',
+                             self.__cache_file, str(exc))
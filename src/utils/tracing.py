@@ -0,0 +1,145 @@
+import contextlib
+import threading
+import time
+
+from .command_logger import CommandLogger, CommandObserver
+
+SERVICE_NAME = 'canaa-migrations'
+
+_local = threading.local()
+_dd_tracer = False
+
+
+def _datadog_tracer():
+    """ ddtrace tracer, if installed and enabled (import is tried once) """
+    global _dd_tracer
+    if _dd_tracer is False:
+        try:
+            from ddtrace import tracer
+            _dd_tracer = tracer
+        except Exception:
+            _dd_tracer = None
+    if _dd_tracer and getattr(_dd_tracer, 'enabled', True):
+        return _dd_tracer
+    return None
+
+
+class Span:
+
+    __slots__ = ['name', 'tags', 'parent', 'start', 'end']
+
+    def __init__(self, name: str, tags: dict = None, parent=None):
+        self.name = name
+        self.tags = dict(tags or {})
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        """ Duration in seconds (None if not finished) """
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_tag(self, key: str, value):
+        self.tags[key] = value
+
+    def __repr__(self):
+        return 'Span({0}, {1}, {2})'.format(self.name, self.tags, self.duration)
+
+
+class SpanRecorder:
+    """
+    Exporter-agnostic in-process span recorder.
+    While active (with statement), keeps every finished span, including
+    MongoDB command spans nested under the current span
+    """
+
+    RECORDERS = []
+
+    def __init__(self):
+        self.spans = []
+        self.__commands = CommandSpans()
+
+    def finish(self, span: Span):
+        self.spans.append(span)
+
+    def find(self, name: str) -> list:
+        return [span for span in self.spans if span.name == name]
+
+    def children(self, parent: Span) -> list:
+        return [span for span in self.spans if span.parent is parent]
+
+    def __enter__(self):
+        SpanRecorder.RECORDERS.append(self)
+        CommandLogger.subscribe(self.__commands)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        CommandLogger.unsubscribe(self.__commands)
+        SpanRecorder.RECORDERS.remove(self)
+
+
+class CommandSpans(CommandObserver):
+    """ Spans of MongoDB commands, children of the span active on their thread """
+
+    def __init__(self):
+        self.__started = {}
+
+    def started(self, event):
+        self.__started[event.request_id] = Span(
+            'mongodb.command',
+            {'command': event.command_name, 'database': event.database_name},
+            current_span())
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, success: bool):
+        span = self.__started.pop(event.request_id, None)
+        if span:
+            span.set_tag('success', success)
+            span.set_tag('duration_micros', event.duration_micros)
+            _finish(span)
+
+
+def current_span() -> Span:
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def _finish(span: Span):
+    span.end = time.perf_counter()
+    for recorder in tuple(SpanRecorder.RECORDERS):
+        recorder.finish(span)
+
+
+@contextlib.contextmanager
+def trace(operation_name: str, **tags):
+    """
+    Opens a span, child of current span, on in-process recorders
+    and on the datadog tracer (when enabled)
+    """
+    span = Span(operation_name, tags, current_span())
+    dd_tracer = _datadog_tracer()
+    dd_span = dd_tracer.trace(operation_name, service=SERVICE_NAME) \
+        if dd_tracer else None
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(span)
+    try:
+        yield span
+    except Exception as exc:
+        span.set_tag('error', str(exc))
+        raise
+    finally:
+        _local.stack.pop()
+        _finish(span)
+        if dd_span:
+            for key, value in span.tags.items():
+                dd_span.set_tag(key, value)
+            dd_span.finish()
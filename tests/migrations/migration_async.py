@@ -0,0 +1,12 @@
+"""Testing async migration
+"""
+
+dependencies = []
+
+
+async def upgrade(db):
+    return True
+
+
+def downgrade(db):
+    return True
@@ -0,0 +1,14 @@
+"""Testing invalid async online migration
+"""
+
+dependencies = []
+
+online = True
+
+
+async def upgrade(db):
+    return True
+
+
+def downgrade(db):
+    return True
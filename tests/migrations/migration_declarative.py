@@ -0,0 +1,18 @@
+"""Testing declarative migration
+"""
+from src.migration_operations import Convert, Rename, SetDefault, Unset
+
+dependencies = []
+
+operations = {
+    'users': [Rename('name', 'full_name'), SetDefault('active', True)],
+    'orders': [Unset('legacy'), Convert('total', 'decimal')]
+}
+
+
+def downgrade(db):
+    return True
+
+
+def verify(db):
+    return {'ok': True}
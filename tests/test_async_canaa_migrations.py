@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from src.async_canaa_migrations import AsyncCanaaMigrations
+
+
+class FakeMigration:
+
+    def __init__(self, name, dependencies=None, is_async=False, can_continue=True):
+        self.name = name
+        self.dependencies = dependencies or []
+        self.description = name
+        self.async_upgrade = is_async
+        self.online = False
+        self.verifiable = False
+        self.can_continue = can_continue
+
+    def release(self):
+        pass
+
+    def after_upgrade(self, raised_exception):
+        return self.can_continue
+
+
+class FakeEngine:
+
+    def __init__(self, events):
+        self.events = events
+        self.applied = []
+
+    def apply_upgrade(self, migration):
+        self.events.append(('start', migration.name))
+        self.events.append(('end', migration.name))
+        return True, migration.can_continue
+
+    def can_upgrade(self, migration):
+        return all(dependency in self.applied for dependency in migration.dependencies)
+
+    def write_applied(self, migration, state, running_time):
+        self.applied.append(migration.name)
+
+
+class TestAsyncCanaaMigrations(unittest.TestCase):
+
+    def engine(self, migrations, concurrency=4):
+        setup = SimpleNamespace(is_ok=True, migrations=migrations,
+                                mongodb_uri='mongodb://localhost:27017/test_db',
+                                db=SimpleNamespace(name='test_db'),
+                                collection=SimpleNamespace(name='canaa_migrations'),
+                                save_checksums=lambda: None)
+        engine = AsyncCanaaMigrations(setup, concurrency)
+        self.events = []
+        engine._engine = FakeEngine(self.events)
+        engine._states = SimpleNamespace(read_states=lambda names: [])
+        engine._history = SimpleNamespace(add=lambda *args: None, flush=lambda: 0)
+        return engine
+
+    def test_dependency_order(self):
+        events = []
+
+        async def upgrade(db):
+            events.append(('start', 'a'))
+            await asyncio.sleep(0.01)
+            events.append(('end', 'a'))
+            return True
+
+        a = FakeMigration('a', is_async=True)
+        a.upgrade = upgrade
+        engine = self.engine([a, FakeMigration('b'), FakeMigration('c', ['a']),
+                              FakeMigration('d', ['c', 'b'])])
+        engine._engine.events = events
+        self.assertTrue(engine.run())
+
+        position = {event: index for index, event in enumerate(events)}
+        # b is independent of a: runs while a is awaiting
+        self.assertLess(position[('start', 'b')], position[('end', 'a')])
+        self.assertLess(position[('end', 'a')], position[('start', 'c')])
+        self.assertLess(position[('end', 'c')], position[('start', 'd')])
+        self.assertLess(position[('end', 'b')], position[('start', 'd')])
+        self.assertEqual(['a', 'b', 'c', 'd'], sorted(engine._engine.applied))
+
+    def test_stopped(self):
+        engine = self.engine([FakeMigration('a', can_continue=False),
+                              FakeMigration('b'), FakeMigration('c', ['b'])],
+                             concurrency=1)
+        self.assertTrue(engine.run())
+        self.assertEqual(['a'], engine._engine.applied)
+        totals = engine.report.totals()['migrations']
+        self.assertEqual(1, totals['successful'])
+        self.assertEqual(2, totals['not_run'])
+
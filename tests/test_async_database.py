@@ -0,0 +1,39 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from src.migration_action import MigrationAction
+from src.utils import async_database
+from src.utils.async_database import gather_limited, run_upgrade
+
+
+class TestAsyncDatabase(unittest.TestCase):
+
+    def test_gather_limited(self):
+        in_flight = []
+        peak = []
+
+        async def batch(index):
+            in_flight.append(index)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.001)
+            in_flight.remove(index)
+            return index
+
+        results = asyncio.run(gather_limited([batch(i) for i in range(10)], 3))
+        self.assertEqual(list(range(10)), results)
+        self.assertEqual(3, max(peak))
+
+    def test_run_upgrade(self):
+        scratch_db = SimpleNamespace(name='test_db_canaa_scratch')
+        sync_migration = SimpleNamespace(async_upgrade=False, upgrade=mock.Mock(return_value=True))
+        self.assertTrue(run_upgrade(sync_migration, scratch_db, 'mongodb://localhost'))
+        sync_migration.upgrade.assert_called_once_with(scratch_db)
+
+        async_migration = MigrationAction('tests.migrations.migration_async')
+        with mock.patch.object(async_database, 'run_async', return_value=True) as run_async:
+            self.assertTrue(run_upgrade(async_migration, scratch_db, 'mongodb://localhost'))
+            run_async.assert_called_once_with(async_migration.upgrade,
+                                              'mongodb://localhost',
+                                              'test_db_canaa_scratch')
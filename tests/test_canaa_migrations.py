@@ -1,6 +1,8 @@
+import time
 import unittest
 from src.canaa_migrations import CanaaMigrations
 from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationStateData
 
 
 class TestCanaaMigrations(unittest.TestCase):
@@ -20,4 +22,22 @@ class TestCanaaMigrations(unittest.TestCase):
         
     def test_downgrade(self):
         cm = CanaaMigrations(self.setup)
-        cm.downgrade()
\ No newline at end of file
+        cm.downgrade()
+
+    def test_status(self):
+        cm = CanaaMigrations(self.setup)
+        status = cm.status()
+        self.assertEqual(len(self.setup.migrations),
+                         len(status['pending']) + len(status['applied']))
+
+    def test_budget_exceeded(self):
+        cm = CanaaMigrations(self.setup)
+        state = MigrationStateData({'_id': 'migration', 'upgrade_time': 5000})
+        self.assertIsNotNone(cm.budget_exceeded(state, time.time() + 1))
+        self.assertIsNone(cm.budget_exceeded(state, time.time() + 10))
+        self.assertIsNotNone(cm.budget_exceeded(
+            MigrationStateData({'_id': 'migration'}), time.time() - 1))
+        # running_time of a downgraded migration is the downgrade duration
+        downgraded = MigrationStateData({'_id': 'migration', 'running_time': 10,
+                                         'upgrade_time': 5000})
+        self.assertEqual(5000, cm.estimated_time(downgraded))
@@ -0,0 +1,52 @@
+import datetime
+import unittest
+
+from src.cli.cli_list import state_rows
+from src.migration_setup import MigrationSetup
+from src.migration_state import MigrationStateData
+
+
+class FakeStates:
+
+    def __init__(self, applied_names):
+        self.applied_names = applied_names
+        self.queries = []
+
+    def iter_states(self, names=None, applied=None, projection=None):
+        self.queries.append((applied, projection))
+        for name in self.applied_names:
+            yield MigrationStateData({'_id': name,
+                                      'applied': datetime.datetime.now(),
+                                      'description': 'applied'})
+
+
+class TestCliList(unittest.TestCase):
+
+    def setUp(self):
+        self.migrations = MigrationSetup(
+            'mongodb://localhost:27017/test_db').migrations
+        self.first = self.migrations[0].name
+
+    def test_state_rows(self):
+        rows = list(state_rows(FakeStates([self.first]), self.migrations))
+        self.assertEqual(len(self.migrations), len(rows))
+        self.assertIsNotNone(rows[0][1])
+        self.assertTrue(all(row[1] is None for row in rows[1:]))
+
+    def test_pending_only(self):
+        states = FakeStates([self.first])
+        rows = list(state_rows(states, self.migrations, pending_only=True))
+        self.assertNotIn(self.first, [row[0] for row in rows])
+        self.assertEqual([(True, ['_id'])], states.queries)
+
+    def test_applied_only(self):
+        rows = list(state_rows(FakeStates([self.first]), self.migrations,
+                               applied_only=True))
+        self.assertEqual([self.first], [row[0] for row in rows])
+
+    def test_estimated_state(self):
+        states = FakeStates([])
+        states.iter_states = lambda *args: iter(
+            [MigrationStateData({'_id': self.first, 'estimated_time': 100})])
+        rows = list(state_rows(states, self.migrations))
+        self.assertEqual((self.first, None, self.migrations[0].description), rows[0])
@@ -0,0 +1,57 @@
+import unittest
+
+from src.utils.command_logger import CommandCounter, CommandLogger
+
+
+class Event:
+
+    def __init__(self, command_name, database_name='test_db', reply=None,
+                 duration_micros=10, request_id=1, collection=None):
+        self.command_name = command_name
+        self.database_name = database_name
+        self.reply = reply or {}
+        self.duration_micros = duration_micros
+        self.request_id = request_id
+        self.command = {command_name: collection} if collection else {}
+
+
+class TestCommandLogger(unittest.TestCase):
+
+    def test_counter_subscription(self):
+        logger = CommandLogger()
+        with CommandCounter('test_db') as counter:
+            logger.succeeded(Event('insert', reply={'n': 10}))
+            logger.succeeded(Event('find'))
+            logger.succeeded(Event('insert', 'other_db', {'n': 5}))
+            logger.failed(Event('update'))
+        logger.succeeded(Event('find'))
+
+        self.assertEqual(3, counter.commands)
+        self.assertEqual(1, counter.failures)
+        self.assertEqual(10, counter.documents)
+        self.assertEqual(30, counter.duration_micros)
+
+    def test_counter_excluded_collection(self):
+        logger = CommandLogger()
+        with CommandCounter('test_db', 'canaa_migrations') as counter:
+            for request_id, collection in enumerate(['numbers', 'canaa_migrations']):
+                event = Event('update', reply={'n': 1}, request_id=request_id,
+                              collection=collection)
+                logger.started(event)
+                logger.succeeded(event)
+
+        self.assertEqual(1, counter.commands)
+        self.assertEqual(1, counter.documents)
+
+    def test_counter_split(self):
+        counter = CommandCounter('test_db')
+        counter.commands = 7
+        counter.documents = 10
+        parts = counter.split(3)
+        self.assertEqual([3, 2, 2], [part.commands for part in parts])
+        self.assertEqual(10, sum(part.documents for part in parts))
+
+        snapshot = counter.snapshot()
+        counter.commands += 2
+        self.assertEqual(2, counter.since(snapshot).commands)
+        self.assertEqual(0, counter.since(snapshot).documents)
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.utils import hash_cache
+from src.utils.hash_cache import FileHashCache, file_hash
+
+
+class TestFileHashCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, 'migration.py')
+        self.cache_file = os.path.join(self.folder.name, 'cache.json')
+        with open(self.filename, 'w') as f:
+            f.write('dependencies = []\n')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_hash(self):
+        cache = FileHashCache()
+        self.assertEqual(file_hash(self.filename), cache.hash(self.filename))
+
+    def test_unchanged_file_is_not_read(self):
+        cache = FileHashCache(self.cache_file)
+        digest = cache.hash(self.filename)
+        self.assertTrue(cache.save())
+
+        cache = FileHashCache(self.cache_file)
+        with mock.patch.object(hash_cache, 'file_hash') as hasher:
+            self.assertEqual(digest, cache.hash(self.filename))
+            hasher.assert_not_called()
+
+    def test_changed_file_is_rehashed(self):
+        cache = FileHashCache(self.cache_file)
+        digest = cache.hash(self.filename)
+        with open(self.filename, 'a') as f:
+            f.write('# changed\n')
+        self.assertNotEqual(digest, cache.hash(self.filename))
@@ -1,5 +1,7 @@
+import sys
 import unittest
 from src.migration_action import MigrationAction
+from src.migration_exception import MigrationException
 
 
 class TestMigrationAction(unittest.TestCase):
@@ -11,3 +13,31 @@ class TestMigrationAction(unittest.TestCase):
     def test_invalid_migration_invalid_methods(self):
         with self.assertRaises(Exception):
             MigrationAction('tests.migrations.migration_invalid_methods')
+
+    def test_release(self):
+        ma = MigrationAction('tests.migrations.migration_ok')
+        ma.release()
+        self.assertFalse(ma.is_loaded)
+        self.assertNotIn('tests.migrations.migration_ok', sys.modules)
+        self.assertTrue(ma.after_upgrade(None))
+        self.assertTrue(ma.is_loaded)
+
+    def test_verify(self):
+        ma = MigrationAction('tests.migrations.migration_ok')
+        self.assertFalse(ma.verifiable)
+        self.assertIsNone(ma.verify(None))
+        ma = MigrationAction('tests.migrations.migration_declarative')
+        self.assertTrue(ma.verifiable)
+        ma.release()
+        self.assertTrue(ma.verifiable)
+        self.assertEqual({'ok': True}, ma.verify(None))
+
+    def test_async_upgrade(self):
+        ma = MigrationAction('tests.migrations.migration_async')
+        self.assertTrue(ma.async_upgrade)
+        self.assertFalse(ma.async_downgrade)
+        self.assertFalse(MigrationAction('tests.migrations.migration_ok').async_upgrade)
+
+    def test_async_online_migration(self):
+        with self.assertRaises(MigrationException):
+            MigrationAction('tests.migrations.migration_async_online')
@@ -0,0 +1,25 @@
+import unittest
+
+from src.migration_audit import command_filter, explainable_commands, plan_stages, shape
+
+
+class TestMigrationAudit(unittest.TestCase):
+
+    def test_explainable_commands(self):
+        command = {'update': 'numbers',
+                   'updates': [{'q': {'i': 1}, 'u': {}}, {'q': {'i': 2}, 'u': {}}]}
+        commands = list(explainable_commands([command, {'find': 'numbers'}]))
+        self.assertEqual(3, len(commands))
+        self.assertEqual({'i': 2}, command_filter(commands[1]))
+
+    def test_plan_stages(self):
+        plan = {'queryPlanner': {
+            'winningPlan': {'stage': 'SORT', 'sortPattern': {'i': 1},
+                            'inputStage': {'stage': 'COLLSCAN', 'filter': {}}},
+            'rejectedPlans': [{'stage': 'IXSCAN'}]}}
+        self.assertEqual(['SORT', 'COLLSCAN'],
+                         [stage['stage'] for stage in plan_stages(plan)])
+
+    def test_shape(self):
+        self.assertEqual({'i': 1, 'n': {'$gt': 1}},
+                         shape({'i': 5, 'n': {'$gt': 10}}))
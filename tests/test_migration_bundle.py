@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from src.migration_bundle import BundleImporter, MigrationBundle
+from src.migration_exception import MigrationException
+from src.migration_setup import MigrationSetup
+
+
+class TestMigrationBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, 'migrations.bundle')
+        self.setup = MigrationSetup('mongodb://localhost:27017/test_db')
+        MigrationBundle.build('migrations', self.setup.migrations,
+                              self.setup.checksum).save(self.filename)
+
+    def tearDown(self):
+        self._unload_migrations()
+        self.folder.cleanup()
+
+    def _unload_migrations(self):
+        for name in list(sys.modules):
+            if name == 'migrations' or name.startswith('migrations.'):
+                del sys.modules[name]
+
+    def test_load(self):
+        bundle = MigrationBundle.load(self.filename)
+        self.assertEqual([m.name for m in self.setup.migrations], bundle.names)
+
+    def test_setup_from_bundle(self):
+        self._unload_migrations()
+        setup = MigrationSetup('mongodb://localhost:27017/test_db',
+                               bundle_file=self.filename)
+        try:
+            self.assertTrue(setup.is_ok)
+            self.assertEqual([m.name for m in self.setup.migrations],
+                             [m.name for m in setup.migrations])
+            for migration in setup.migrations:
+                module = sys.modules['migrations.'+migration.name]
+                self.assertIsInstance(module.__spec__.loader, BundleImporter)
+                self.assertEqual(self.setup.checksum(migration),
+                                 setup.checksum(migration))
+        finally:
+            setup.bundle.uninstall()
+
+    def test_invalid_bundle(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'invalid')
+        with self.assertRaises(MigrationException):
+            MigrationBundle.load(self.filename)
@@ -0,0 +1,52 @@
+import unittest
+
+from src.migration_history import MigrationHistory, find_regressions
+from src.migration_setup import MigrationSetup
+
+
+def run(name, running_time, success=True, database='tenant_a'):
+    return {'name': name, 'database': database, 'operation': 'upgrade',
+            'running_time': running_time, 'success': success}
+
+
+class TestMigrationHistory(unittest.TestCase):
+
+    def test_find_regressions(self):
+        runs = [run('a', 100), run('a', 120), run('a', 110), run('a', 600),
+                run('b', 200), run('b', 210), run('b', 250)]
+        regressions = find_regressions(runs, min_time=100)
+        self.assertEqual(1, len(regressions))
+        self.assertEqual('a', regressions[0]['name'])
+        self.assertEqual(110, regressions[0]['baseline'])
+        self.assertEqual(5.45, regressions[0]['ratio'])
+
+    def test_find_regressions_ignores(self):
+        # Failed runs, first runs and fast runs are not flagged
+        self.assertEqual([], find_regressions([run('a', 1000)]))
+        self.assertEqual([], find_regressions([run('a', 100), run('a', 900, False)]))
+        self.assertEqual([], find_regressions([run('a', 10), run('a', 90)],
+                                              min_time=100))
+
+    def test_find_regressions_rolling_baseline(self):
+        runs = [run('a', 1000)] * 5 + [run('a', 100)] * 5 + [run('a', 300)]
+        self.assertEqual(1, len(find_regressions(runs, baseline=5)))
+        self.assertEqual([], find_regressions(runs, baseline=10))
+
+    def test_find_regressions_across_databases(self):
+        # Each tenant database is upgraded once: baseline is the other tenants
+        runs = [run('a', 100, database=database)
+                for database in ['tenant_a', 'tenant_b', 'tenant_c']]
+        runs.append(run('a', 500, database='tenant_d'))
+        regressions = find_regressions(runs)
+        self.assertEqual(['tenant_d'], [r['database'] for r in regressions])
+        self.assertEqual([], find_regressions(runs, by_database=True))
+
+    def test_collection(self):
+        setup = MigrationSetup('mongodb://localhost:27017/test_db', load_migrations=False)
+        self.assertEqual('test_db.canaa_migrations_history',
+                         MigrationHistory(setup).collection.full_name)
+        shared = MigrationSetup('mongodb://localhost:27017/test_db', load_migrations=False,
+                                history_collection='ops.migrations_history')
+        history = MigrationHistory(shared)
+        self.assertEqual('ops.migrations_history', history.collection.full_name)
+        self.assertEqual('test_db', history.add('a', 'upgrade', 10, None, True)['database'])
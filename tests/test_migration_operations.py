@@ -0,0 +1,53 @@
+import unittest
+
+from src.migration_action import MigrationAction
+from src.migration_exception import MigrationException
+from src.migration_operations import (Convert, Rename, SetDefault, Unset,
+                                      compile_operations, fuse_operations)
+
+
+class TestMigrationOperations(unittest.TestCase):
+
+    def test_compile(self):
+        query, pipeline = compile_operations(
+            [Rename('name', 'full_name'), SetDefault('active', True)])
+        self.assertEqual({'$or': [{'name': {'$exists': True}},
+                                  {'active': None}]}, query)
+        self.assertEqual([{'$set': {'full_name': {'$cond': [
+                              {'$eq': [{'$type': '$name'}, 'missing']},
+                              '$full_name', '$name']}}},
+                          {'$unset': 'name'},
+                          {'$set': {'active': {'$ifNull': ['$active', {'$literal': True}]}}}],
+                         pipeline)
+
+    def test_compile_keeps_fields_of_other_operations(self):
+        # {full_name: 'A', active: None} matches only SetDefault filter:
+        # Rename stage must keep full_name when name is missing
+        _, pipeline = compile_operations(
+            [Rename('name', 'full_name'), SetDefault('active', True)])
+        condition, when_missing, when_present = pipeline[0]['$set']['full_name']['$cond']
+        self.assertEqual({'$eq': [{'$type': '$name'}, 'missing']}, condition)
+        self.assertEqual('$full_name', when_missing)
+        self.assertEqual('$name', when_present)
+        self.assertFalse(any(stage.get('$set', {}).get('full_name') == '$name'
+                             for stage in pipeline))
+
+    def test_fuse(self):
+        fused = fuse_operations([{'users': [Unset('a')]},
+                                 {'orders': [Unset('b')]},
+                                 {'users': [Convert('c', 'int')]}])
+        self.assertEqual({'users': [Unset('a'), Convert('c', 'int')],
+                          'orders': [Unset('b')]}, fused)
+
+    def test_invalid_operations(self):
+        with self.assertRaises(MigrationException):
+            Convert('total', 'money')
+        with self.assertRaises(MigrationException):
+            Rename('$name', 'full_name')
+
+    def test_declarative_migration(self):
+        ma = MigrationAction('tests.migrations.migration_declarative')
+        self.assertTrue(ma.declarative)
+        self.assertEqual(['users', 'orders'], ma.collections)
+        ma.release()
+        self.assertEqual(2, len(ma.operations['users']))
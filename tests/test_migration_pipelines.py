@@ -0,0 +1,33 @@
+import unittest
+
+from bson import ObjectId
+
+from src.migration_pipelines import backfill_pipeline, merge_stage, range_filters
+
+
+class TestMigrationPipelines(unittest.TestCase):
+
+    def test_range_filters(self):
+        self.assertEqual([{}], range_filters([]))
+        self.assertEqual([{'_id': {'$lt': 10}},
+                          {'_id': {'$gte': 10, '$lt': 20.5}},
+                          {'_id': {'$gte': 20.5}},
+                          {'_id': {'$not': {'$type': 'number'}}}],
+                         range_filters([10, 20.5]))
+
+    def test_range_filters_mixed_types(self):
+        # Ranges of one type don't match _id values of other types
+        self.assertEqual([{}], range_filters([10, 'a']))
+        self.assertEqual([{}], range_filters([{'a': 1}]))
+        self.assertEqual({'_id': {'$not': {'$type': 'objectId'}}},
+                         range_filters([ObjectId()])[-1])
+
+    def test_merge_stage(self):
+        self.assertEqual({'db': 'other', 'coll': 'numbers'},
+                         merge_stage(('other', 'numbers'))['$merge']['into'])
+
+    def test_backfill_pipeline(self):
+        pipeline = backfill_pipeline('numbers', {'double': {'$multiply': ['$i', 2]}})
+        self.assertEqual({'_id': 1, 'double': {'$multiply': ['$i', 2]}},
+                         pipeline[0]['$project'])
+        self.assertEqual('discard', pipeline[1]['$merge']['whenNotMatched'])
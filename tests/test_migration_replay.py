@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from src.migration_replay import CommandLog, CommandRecorder
+
+
+class Event:
+
+    def __init__(self, command, database_name='test_db'):
+        self.command = command
+        self.command_name = next(iter(command))
+        self.database_name = database_name
+
+
+class TestMigrationReplay(unittest.TestCase):
+
+    def test_recorder(self):
+        recorder = CommandRecorder('test_db', ['insert'])
+        recorder.started(Event({'insert': 'numbers', 'documents': [{'i': 1}],
+                                'lsid': {'id': 1}, '$db': 'test_db'}))
+        recorder.started(Event({'find': 'numbers', 'filter': {}}))
+        recorder.started(Event({'insert': 'numbers', 'documents': []},
+                               'other_db'))
+        self.assertEqual([{'insert': 'numbers', 'documents': [{'i': 1}]}],
+                         recorder.commands)
+
+    def test_recorder_aggregate(self):
+        read = {'aggregate': 'numbers', 'pipeline': [{'$match': {'i': 1}}]}
+        write = {'aggregate': 'numbers', 'pipeline': [{'$out': 'copy'}]}
+        replay = CommandRecorder('test_db', ['aggregate'], writes_only=True)
+        audit = CommandRecorder('test_db', ['aggregate'])
+        for recorder in [replay, audit]:
+            recorder.started(Event(read))
+            recorder.started(Event(write))
+        self.assertEqual([write], replay.commands)
+        self.assertEqual([read, write], audit.commands)
+
+    def test_compact(self):
+        commands = [{'insert': 'numbers', 'ordered': True, 'documents': [{'i': i}]}
+                    for i in range(5)]
+        commands.append({'drop': 'names'})
+        commands.append({'insert': 'numbers', 'ordered': True,
+                         'documents': [{'i': 5}]})
+        log = CommandLog('migration', commands=commands).compact()
+        self.assertEqual(3, len(log.commands))
+        self.assertEqual(5, len(log.commands[0]['documents']))
+
+    def test_save_load(self):
+        log = CommandLog('migration', 'description', ['dependency'], 'abc',
+                         'test_db', [{'drop': 'names'}])
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'migration.replay')
+            log.save(filename)
+            loaded = CommandLog.load(filename)
+        self.assertEqual(log.commands, loaded.commands)
+        self.assertEqual(['dependency'], loaded.dependencies)
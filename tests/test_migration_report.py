@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.migration_report import RunReport
+from src.utils.command_logger import CommandCounter
+
+
+class TestMigrationReport(unittest.TestCase):
+
+    def setUp(self):
+        counter = CommandCounter()
+        counter.commands = 3
+        counter.duration_micros = 4000
+        counter.documents = 10
+        with RunReport('upgrade', 'test_db', 'canaa_migrations') as self.report:
+            self.report.add('migration_a', 'successful', 20, counter)
+            self.report.add('migration_b', 'unsuccessful', 5)
+            self.report.add_names(['migration_c'], 'previously_applied')
+
+    def test_totals(self):
+        totals = self.report.totals()
+        self.assertEqual(1, totals['migrations']['successful'])
+        self.assertEqual(1, totals['migrations']['unsuccessful'])
+        self.assertEqual(1, totals['migrations']['previously_applied'])
+        self.assertEqual(25, totals['migration_time'])
+        self.assertEqual(3, totals['commands'])
+        self.assertEqual(4, totals['command_time'])
+        self.assertIsNotNone(self.report.finished)
+
+    def test_prometheus(self):
+        text = self.report.to_prometheus()
+        self.assertIn('# TYPE canaa_migration_run_duration_seconds gauge', text)
+        self.assertIn('canaa_migration_run_migrations{operation="upgrade",'
+                      'database="test_db",status="successful"} 1', text)
+        self.assertIn('canaa_migration_duration_seconds{operation="upgrade",'
+                      'database="test_db",migration="migration_a",'
+                      'status="successful"} 0.02', text)
+        self.assertIn('canaa_migration_documents{operation="upgrade",'
+                      'database="test_db",migration="migration_a",'
+                      'status="successful"} 10\n', text)
+        self.assertNotIn('migration="migration_c"', text)
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as folder:
+            json_file = os.path.join(folder, 'report.json')
+            self.report.save(json_file)
+            with open(json_file) as f:
+                data = json.load(f)
+            self.assertEqual(3, len(data['migrations']))
+            self.assertEqual('upgrade', data['operation'])
+
+            prom_file = os.path.join(folder, 'canaa.prom')
+            self.report.save(prom_file)
+            with open(prom_file) as f:
+                self.assertTrue(f.read().startswith('# HELP'))
+            self.assertEqual(['canaa.prom', 'report.json'], sorted(os.listdir(folder)))
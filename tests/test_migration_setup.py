@@ -1,4 +1,9 @@
+import os
+import shutil
+import sys
+import tempfile
 import unittest
+from unittest import mock
 from src.migration_setup import  MigrationSetup
 
 class TestMigrationSetup(unittest.TestCase):
@@ -8,3 +13,55 @@ class TestMigrationSetup(unittest.TestCase):
         self.assertTrue(ms.is_ok)
         coll = ms.collection
         self.assertIsNotNone(coll)
+
+    def test_checksum(self):
+        ms = MigrationSetup('mongodb://localhost:27017/test_db')
+        for migration in ms.migrations:
+            self.assertEqual(64, len(ms.checksum(migration)))
+
+    def test_migration_names(self):
+        ms = MigrationSetup('mongodb://localhost:27017/test_db', load_migrations=False)
+        self.assertEqual([], ms.migrations)
+        names = ms.migration_names()
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(names, [migration.name for migration in
+                                 MigrationSetup('mongodb://localhost:27017/test_db').migrations])
+
+    def test_load_errors(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        package = 'tmp_migrations'
+        folder = os.path.join(base, package)
+        os.mkdir(folder)
+        # Package folder is relative to working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(base)
+        sys.path.insert(0, base)
+        self.addCleanup(sys.path.remove, base)
+        self.addCleanup(self._unload, package)
+
+        modules = 4
+        for index in range(modules):
+            with open(os.path.join(folder, 'migration_{0:02}.py'.format(index)), 'w') as f:
+                f.write('dependencies = []\ndef upgrade(db):\n    return True\n'
+                        'def downgrade(db):\n    return True\n')
+        with open(os.path.join(folder, 'migration_syntax.py'), 'w') as f:
+            f.write('def upgrade(db)\n')
+        with open(os.path.join(folder, 'migration_methods.py'), 'w') as f:
+            f.write('dependencies = []\n')
+
+        for load_workers in [1, 2]:
+            with mock.patch.object(MigrationSetup, 'PARALLEL_LOAD_MIN_MODULES', modules):
+                ms = MigrationSetup('mongodb://localhost:27017/test_db',
+                                    package, load_workers=load_workers)
+            self.assertFalse(ms.is_ok)
+            self.assertEqual({package+'.migration_methods', package+'.migration_syntax'},
+                             set(ms.load_errors))
+            self.assertEqual(modules + 2, len(ms.load_times))
+            self._unload(package)
+
+    @staticmethod
+    def _unload(package):
+        for name in [name for name in sys.modules
+                     if name == package or name.startswith(package+'.')]:
+            del sys.modules[name]
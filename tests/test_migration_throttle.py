@@ -0,0 +1,76 @@
+import time
+import unittest
+
+from pymongo.results import BulkWriteResult, InsertManyResult
+
+from src.migration_throttle import AdaptiveThrottle, LatencyWindow, ThrottledCollection
+
+
+class Event:
+
+    def __init__(self, duration_micros):
+        self.duration_micros = duration_micros
+
+
+class TestMigrationThrottle(unittest.TestCase):
+
+    def test_percentile(self):
+        window = LatencyWindow()
+        for duration in range(1, 101):
+            window.succeeded(Event(duration))
+        self.assertEqual(100, window.percentile(99))
+        self.assertEqual(51, window.percentile(50))
+
+    def test_acquire_caps_rate(self):
+        throttle = AdaptiveThrottle(max_ops_per_second=100)
+        t0 = time.monotonic()
+        for _ in range(11):
+            throttle.acquire()
+        self.assertGreaterEqual(time.monotonic() - t0, 0.09)
+
+    def test_backoff_and_recover(self):
+        throttle = AdaptiveThrottle(max_ops_per_second=1000,
+                                    target_p99_micros=1000, batch_size=100)
+        for _ in range(20):
+            throttle.window.succeeded(Event(5000))
+        throttle.adjust()
+        self.assertEqual(500, throttle.rate)
+        self.assertEqual(50, throttle.batch_size)
+
+        for _ in range(20):
+            throttle.window.succeeded(Event(10))
+        throttle.adjust()
+        self.assertGreater(throttle.rate, 500)
+        self.assertGreater(throttle.batch_size, 50)
+
+    def test_batches(self):
+        throttle = AdaptiveThrottle(max_ops_per_second=100000, batch_size=10)
+        batches = list(throttle.batches(range(25)))
+        self.assertEqual([10, 10, 5], [len(batch) for batch in batches])
+
+    def test_chunked_writes(self):
+        class FakeCollection:
+            def __init__(self):
+                self.calls = []
+
+            def insert_many(self, documents, ordered=True):
+                self.calls.append(len(documents))
+                return InsertManyResult([document['_id'] for document in documents], True)
+
+            def bulk_write(self, requests):
+                self.calls.append(len(requests))
+                return BulkWriteResult({'nInserted': len(requests),
+                                        'upserted': [{'index': 0, '_id': 'x'}]}, True)
+
+        fake = FakeCollection()
+        throttle = AdaptiveThrottle(max_ops_per_second=100000, batch_size=10)
+        collection = ThrottledCollection(fake, throttle)
+        result = collection.insert_many([{'_id': i} for i in range(25)], ordered=False)
+        self.assertEqual([10, 10, 5], fake.calls)
+        self.assertEqual(list(range(25)), result.inserted_ids)
+
+        fake.calls = []
+        result = collection.bulk_write(requests=list(range(15)))
+        self.assertEqual([10, 5], fake.calls)
+        self.assertEqual(15, result.inserted_count)
+        self.assertEqual({0: 'x', 10: 'x'}, result.upserted_ids)
@@ -0,0 +1,195 @@
+import unittest
+from types import SimpleNamespace
+
+from src.canaa_migrations import CanaaMigrations
+from src.migration_state import MigrationStateData
+from src.migration_transaction import SessionCollection, SessionDatabase
+from src.utils.tracing import SpanRecorder
+
+
+class FakeCollection:
+
+    name = 'numbers'
+
+    def insert_one(self, document, session=None):
+        return session
+
+    def rename(self, new_name):
+        return new_name
+
+
+class FakeTransaction:
+
+    def __init__(self, session):
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.session.events.append('abort' if exc_type else 'commit')
+
+
+class FakeSession:
+
+    def __init__(self, events):
+        self.events = events
+
+    def start_transaction(self):
+        return FakeTransaction(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+
+class FakeDatabase:
+
+    name = 'test_db'
+
+    def __init__(self):
+        self.events = []
+        self.client = SimpleNamespace(start_session=lambda: FakeSession(self.events))
+
+    def __getitem__(self, name):
+        return FakeCollection()
+
+    def get_collection(self, name):
+        return FakeCollection()
+
+    def command(self, command, session=None):
+        return session
+
+    def create_collection(self, name, session=None):
+        if session is not None:
+            # Collection creation not allowed in this server's transactions
+            raise Exception('Cannot create namespace in multi-document transaction')
+        self.events.append(('create_collection', name))
+        return True
+
+    def list_collection_names(self):
+        return []
+
+
+class FakeMigration:
+
+    dependencies = []
+    async_upgrade = False
+    online = False
+    verifiable = False
+    declarative = False
+    deferrable = False
+    small = True
+
+    def __init__(self, name, create_collection=False):
+        self.name = name
+        self.description = name
+        self.create_collection = create_collection
+        self.calls = []
+
+    def upgrade(self, db):
+        self.calls.append(type(db).__name__)
+        if self.create_collection:
+            db.create_collection(self.name)
+        return True
+
+    def after_upgrade(self, raised_exception):
+        return True
+
+    def release(self):
+        pass
+
+
+class FakeStates:
+
+    def __init__(self):
+        self.writes = []
+
+    def read_states(self, names):
+        return []
+
+    def write_state(self, state, session=None):
+        self.writes.append((state.name, session is not None))
+
+
+class TestMigrationTransaction(unittest.TestCase):
+
+    def test_session_collection(self):
+        collection = SessionCollection(FakeCollection(), 'session')
+        self.assertEqual('session', collection.insert_one({}))
+        self.assertEqual('other', collection.insert_one({}, session='other'))
+        self.assertEqual('numbers_old', collection.rename('numbers_old'))
+        self.assertEqual('numbers', collection.name)
+
+    def test_session_database(self):
+        db = SessionDatabase(FakeDatabase(), 'session')
+        self.assertEqual('session', db.session)
+        self.assertEqual('session', db['numbers'].insert_one({}))
+        self.assertEqual('session', db.get_collection('numbers').insert_one({}))
+        self.assertEqual('session', db.command('ping'))
+        with self.assertRaises(Exception):
+            # create_collection runs in the session (transaction) too
+            db.create_collection('numbers')
+
+    def _migrations(self, db):
+        setup = SimpleNamespace(is_ok=True, db=db,
+                                collection=SimpleNamespace(name='canaa_migrations'),
+                                mongodb_uri='mongodb://localhost:27017/test_db',
+                                checksum=lambda migration: None)
+        migrations = CanaaMigrations(setup)
+        migrations._states = FakeStates()
+        migrations._history = SimpleNamespace(add=lambda *args: None)
+        return migrations
+
+    def test_grouped_spans(self):
+        migrations = self._migrations(FakeDatabase())
+        states = [(FakeMigration(name), MigrationStateData({'_id': name}))
+                  for name in ['a', 'b']]
+        with SpanRecorder() as recorder:
+            self.assertTrue(migrations._run_grouped(states, [], [], (1000, 5000)))
+        group = recorder.find('canaa.group')[0]
+        spans = recorder.find('canaa.migration')
+        self.assertEqual(['a', 'b'], [span.tags['name'] for span in spans])
+        self.assertTrue(all(span.parent is group and span.tags['grouped']
+                            for span in spans))
+
+    def test_grouped_fallback(self):
+        db = FakeDatabase()
+        migrations = self._migrations(db)
+        a = FakeMigration('a')
+        b = FakeMigration('b', create_collection=True)
+        states = [(a, MigrationStateData({'_id': 'a'})),
+                  (b, MigrationStateData({'_id': 'b'}))]
+        successful = []
+        unsuccessful = []
+
+        self.assertTrue(migrations._run_grouped(states, successful, unsuccessful,
+                                                (1000, 5000)))
+        # Transaction aborted, then each migration applied alone
+        self.assertEqual('abort', db.events[0])
+        self.assertEqual(['SessionDatabase', 'FakeDatabase'], a.calls)
+        self.assertEqual(['SessionDatabase', 'FakeDatabase'], b.calls)
+        self.assertEqual([('create_collection', 'b')], db.events[1:])
+        self.assertEqual([('a', True), ('a', False), ('b', False)],
+                         migrations._states.writes)
+        self.assertEqual(['a', 'b'], successful)
+        self.assertEqual([], unsuccessful)
+
+    def test_groupable(self):
+        migrations = CanaaMigrations(SimpleNamespace(is_ok=True))
+        small = FakeMigration('small')
+        unknown = FakeMigration('unknown')
+        unknown.small = False
+        # Never estimated nor applied: not grouped unless declared small
+        self.assertTrue(migrations.groupable(
+            small, MigrationStateData({'_id': 'small'}), 5000))
+        self.assertFalse(migrations.groupable(
+            unknown, MigrationStateData({'_id': 'unknown'}), 5000))
+        self.assertTrue(migrations.groupable(
+            unknown, MigrationStateData({'_id': 'unknown', 'estimated_time': 0}), 5000))
+        self.assertTrue(migrations.groupable(
+            unknown, MigrationStateData({'_id': 'unknown', 'upgrade_time': 100}), 5000))
+        self.assertFalse(migrations.groupable(
+            unknown, MigrationStateData({'_id': 'unknown', 'upgrade_time': 6000}), 5000))
@@ -0,0 +1,22 @@
+import unittest
+
+from src.migration_verifier import _has_field, partition_pipeline
+
+
+class TestMigrationVerifier(unittest.TestCase):
+
+    def test_partition_pipeline(self):
+        pipeline = partition_pipeline({'_id': {'$lt': 10}}, ['i', 'a.b'])
+        self.assertEqual({'$match': {'_id': {'$lt': 10}}}, pipeline[0])
+        group = pipeline[1]['$group']
+        self.assertEqual({'$sum': 1}, group['count'])
+        self.assertIn('hash', group)
+        self.assertEqual({'$eq': [{'$type': '$a.b'}, 'missing']},
+                         group['f1']['$sum']['$cond'][0])
+
+    def test_has_field(self):
+        document = {'i': 0, 'a': {'b': None}}
+        self.assertTrue(_has_field(document, 'i'))
+        self.assertTrue(_has_field(document, 'a.b'))
+        self.assertFalse(_has_field(document, 'a.c'))
+        self.assertFalse(_has_field(document, 'i.j'))
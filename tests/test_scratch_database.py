@@ -0,0 +1,76 @@
+import unittest
+
+from src.migration_exception import MigrationException
+from src.scratch_database import ScratchDatabase
+
+
+class FakeCollection:
+
+    def __init__(self, documents=None):
+        self.documents = list(documents or [])
+
+    def list_indexes(self):
+        return [{'name': '_id_', 'key': {'_id': 1}, 'v': 2}]
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+    def aggregate(self, pipeline):
+        return self.documents[:pipeline[0]['$sample']['size']]
+
+    def insert_one(self, document):
+        self.documents.append(document)
+
+    def insert_many(self, documents):
+        self.documents.extend(documents)
+
+
+class FakeDatabase:
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def list_collection_names(self):
+        return list(self.collections)
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.databases = {}
+
+    def get_database(self, name):
+        return self.databases.setdefault(name, FakeDatabase(self, name))
+
+    def list_database_names(self):
+        return [name for name, db in self.databases.items() if db.collections]
+
+    def drop_database(self, name):
+        self.databases.pop(name, None)
+
+
+class TestScratchDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.source = self.client.get_database('test_db')
+        self.source.collections['numbers'] = FakeCollection([{'i': i} for i in range(10)])
+
+    def test_sample(self):
+        with ScratchDatabase(self.source, ['numbers'], 4) as scratch:
+            self.assertEqual('test_db_canaa_scratch', scratch.db.name)
+            self.assertEqual({'numbers': (4, 10)}, scratch.samples)
+        self.assertEqual(['test_db'], self.client.list_database_names())
+
+    def test_foreign_database(self):
+        # Never drops a database it didn't create
+        self.client.get_database('test_db_canaa_scratch')['users'].insert_one({})
+        with self.assertRaises(MigrationException):
+            with ScratchDatabase(self.source, ['numbers'], 4):
+                pass
+        self.assertIn('test_db_canaa_scratch', self.client.list_database_names())
@@ -0,0 +1,42 @@
+import unittest
+
+from src.canaa_migrations import CanaaMigrations
+from src.migration_setup import MigrationSetup
+from src.utils.command_logger import CommandLogger
+from src.utils.tracing import SpanRecorder, trace
+
+
+class Event:
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.command_name = 'find'
+        self.database_name = 'test_db'
+        self.command = {}
+        self.duration_micros = 10
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_nested_spans(self):
+        logger = CommandLogger()
+        with SpanRecorder() as recorder:
+            with trace('root') as root:
+                with trace('child', name='child') as child:
+                    logger.started(Event(1))
+                    logger.succeeded(Event(1))
+        self.assertEqual(['mongodb.command', 'child', 'root'],
+                         [span.name for span in recorder.spans])
+        self.assertIs(root, child.parent)
+        self.assertIs(child, recorder.find('mongodb.command')[0].parent)
+        self.assertGreaterEqual(root.duration, child.duration)
+
+    def test_migration_span(self):
+        setup = MigrationSetup('mongodb://localhost:27017/test_db')
+        migration = [m for m in setup.migrations if not m.dependencies][-1]
+        with SpanRecorder() as recorder:
+            CanaaMigrations(setup).apply_upgrade(migration)
+        span = recorder.find('canaa.migration')[0]
+        self.assertEqual(migration.name, span.tags['name'])
+        self.assertTrue(span.tags['success'])
+        self.assertIn('running_time', span.tags)